@@ -35,6 +35,29 @@ class BenchDimension:
         self.length == self.length
 
 
+class BenchTrustedMode:
+    """Arithmetic with and without dimension checks."""
+
+    def setup(self):
+        self.x = sca * m
+        self.t = sca * s
+
+    def _use_case(self):
+        x, t = self.x, self.t
+        acc = 0 * m
+        for _ in range(100):
+            acc = acc + x - x / t * t
+            acc < x
+        return acc
+
+    def time_use_case_checked(self):
+        self._use_case()
+
+    def time_use_case_trusted(self):
+        with physipy.trusted_mode():
+            self._use_case()
+
+
 class BasicPhysipy:
     def setup(self):
         self.arr = np.arange(10)
@@ -91,3 +114,16 @@ class BasicPhysipy:
         lmbdas = ech_lmbda_mum*mum
         Tbb = 300*K
         integral = np.trapz(plancks_law(lmbdas, Tbb), x=lmbdas)
+
+    def time_use_case2_quad_vec(self):
+        from physipy import units, constants, K
+        from physipy.calculus import quad_vec
+        mum = units["mum"]
+        hp = constants["h"]
+        c = constants["c"]
+        kB = constants["k"]
+
+        def plancks_law(lmbda, Tbb):
+            return 2*hp*c**2/lmbda**5 * 1/(np.exp(hp*c/(lmbda*kB*Tbb))-1)
+        Tbbs = np.linspace(250, 350) * K
+        integral, err = quad_vec(plancks_law, 2*mum, 15*mum, args=(Tbbs,))
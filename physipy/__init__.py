@@ -7,11 +7,21 @@ This is the __init__ docstring of physipy.
 
 from ._version import __version__
 
-from .quantity import Quantity, Dimension, make_quantity, quantify, DimensionError, dimensionify
-from .quantity import check_dimension, set_favunit, dimension_and_favunit, drop_dimension, decorate_with_various_unit, add_back_unit_param, asqarray
+from .quantity import Quantity, Dimension, make_quantity, quantify, DimensionError, dimensionify, ufunc_threads, trusted_mode
+from .quantity import check_dimension, set_favunit, dimension_and_favunit, drop_dimension, decorate_with_various_unit, add_back_unit_param, asqarray, qgroupby
 
 from .quantity import setup_matplotlib, plotting_context
 from .quantity import utils
 
 from .quantity import m, kg, s, A, K, cd, mol, rad, sr, units, imperial_units
 from ._constants import constants, scipy_constants, scipy_constants_codata
+
+# with PHYSIPY_ERASE_UNITS=1, expose units and constants as their SI-values
+if utils.ERASE_UNITS:
+    m, kg, s, A, K, cd, mol, rad, sr = (utils._scale_factor(unit) for unit in
+                                        (m, kg, s, A, K, cd, mol, rad, sr))
+    units, imperial_units, constants, scipy_constants, \
+        scipy_constants_codata = (
+            {key: utils._scale_factor(value) for key, value in dic.items()}
+            for dic in (units, imperial_units, constants, scipy_constants,
+                        scipy_constants_codata))
@@ -17,14 +17,59 @@ import numpy as np
 import scipy
 import scipy.integrate
 import scipy.optimize
+import scipy.sparse
 
 from physipy import quantify, Quantity, Dimension, DimensionError
+from physipy.quantity.quantity import _CHECK_DIMENSIONS
 from physipy.quantity.utils import check_dimension
 from .quantity.dimension import SI_UNIT_SYMBOL
 from .quantity.utils import decorate_with_various_unit, asqarray
 
 
-def xvectorize(func: Callable) -> Callable:
+def _array_call(func: Callable, x, state: dict):
+    """Call func once on the whole array x, if func supports it.
+
+    Returns the result as a Quantity, or None if the caller must loop over
+    x. state caches, for a decorated function, whether func is known to
+    support arrays (True), known not to (False), or unknown yet (None).
+    On the first call with at least 2 elements, the result is checked
+    against calls on the first and last elements only, so that
+    non-elementwise functions returning an array of the right shape are
+    detected.
+    """
+    if state["array_capable"] is False or not isinstance(
+            x, (Quantity, np.ndarray)):
+        return None
+    shape = np.shape(x.value) if isinstance(x, Quantity) else x.shape
+    if state["array_capable"] is None and np.prod(shape) < 2:
+        return None
+    try:
+        res = quantify(func(x))
+        if not np.shape(res.value) == shape:
+            res = None
+        elif state["array_capable"] is None:
+            xs = x.flatten()
+            res_flat = res.flatten()
+            for i in (0, -1):
+                item = quantify(func(xs[i]))
+                if not (item.dimension == res.dimension and np.allclose(
+                        item.value, res_flat[i].value, rtol=1e-12, atol=0,
+                        equal_nan=True)):
+                    res = None
+                    break
+    except Exception:
+        res = None
+    if res is None:
+        # arrays that happen to break a known array-capable function
+        # are looped over without changing the cached decision
+        if state["array_capable"] is None:
+            state["array_capable"] = False
+        return None
+    state["array_capable"] = True
+    return res
+
+
+def xvectorize(func: Callable, try_array: bool = True) -> Callable:
     """
     1-D vectorize func.
 
@@ -32,26 +77,39 @@ def xvectorize(func: Callable) -> Callable:
     Returned value will be a Quantity object, even if returned values are
     dimensionless (because of the use of asqarray).
 
-    Just like np.vectorize, this decorator is a utility to wrap a for loop -
-    it does not improve performance in any way.
+    If func already works on arrays, it is called once on the whole input,
+    at numpy speed. Otherwise, just like np.vectorize, this decorator is a
+    utility to wrap a for loop. Whether func works on arrays is checked on
+    the first call and cached in the decorated function.
+
+    The array call assumes func is elementwise : the check only compares
+    the first and last elements with separate calls, so a function that
+    mixes the elements but leaves both ends unchanged (like a sort) is
+    not detected. Use try_array=False for such functions.
 
     Parameter
     ---------
     func : callable
         A function of one parameter.
+    try_array : bool, defaults to True
+        If False, func is always called on each element.
 
     Returns
     -------
     callable
         Decorated function.
     """
+    state = {"array_capable": None if try_array else False}
+
     def vec_func(x):
-        res = asqarray([func(i) for i in x])
+        res = _array_call(func, x, state)
+        if res is None:
+            res = asqarray([func(i) for i in x])
         return res
     return vec_func
 
 
-def ndvectorize(func: Callable) -> Callable:
+def ndvectorize(func: Callable, try_array: bool = True) -> Callable:
     """
     1-D vectorize func and accept input as ndarray.
 
@@ -62,22 +120,35 @@ def ndvectorize(func: Callable) -> Callable:
     Basically, func is applied to each value in arg input (as a flat list),
     and output is reshaped to input shape.
 
-    Just like np.vectorize, this decorator is a utility to wrap a for loop -
-    it does not improve performance in any way.
+    If func already works on arrays, it is called once on the whole input,
+    at numpy speed. Otherwise, just like np.vectorize, this decorator is a
+    utility to wrap a for loop. Whether func works on arrays is checked on
+    the first call and cached in the decorated function.
+
+    The array call assumes func is elementwise : the check only compares
+    the first and last elements with separate calls, so a function that
+    mixes the elements but leaves both ends unchanged (like a sort) is
+    not detected. Use try_array=False for such functions.
 
     Parameter
     ---------
     func : callable
         A function of one parameter.
+    try_array : bool, defaults to True
+        If False, func is always called on each element.
 
     Returns
     -------
     callable
         Decorated function.
     """
+    state = {"array_capable": None if try_array else False}
+
     def vec_func(x):
-        res = asqarray([func(i) for i in x.flat])
-        res.value = res.value.reshape(x.shape)
+        res = _array_call(func, x, state)
+        if res is None:
+            res = asqarray([func(i) for i in x.flat])
+            res.value = res.value.reshape(x.shape)
         return res
     return vec_func
 
@@ -111,10 +182,99 @@ def trapz2(Zs: Quantity, ech_x: Quantity, ech_y: Quantity) -> Quantity:
 
 
 
-def quad(func, x0, x1, *oargs, args=(), **kwargs):
+class _UnitErasedFunction(object):
+    """Float-valued function to pass to a solver, that runs the user
+    function on raw SI-values instead of Quantity objects.
+
+    func_value is the safe version, that casts its float inputs back to
+    Quantity objects before calling the user function. func_raw calls the
+    user function directly with the float inputs : it is run with dimension
+    checks disabled, so that the user function can still mix its inputs
+    with Quantity constants, and only the values are computed.
+
+    The raw version must first be validated against the safe version with
+    check. Every revalidate_every calls, both versions are compared again.
+    If they disagree, or if the raw version raises, the safe version is
+    used from then on and invalidated is set, so that the solver can be
+    run again with the safe version.
+    """
+
+    def __init__(self, func_value: Callable, func_raw: Callable,
+                 revalidate_every: int | None = None):
+        self.func_value = func_value
+        self.func_raw = func_raw
+        self.revalidate_every = revalidate_every
+        self.n_calls = 0
+        self.invalidated = False
+
+    def _raw(self, *values):
+        token = _CHECK_DIMENSIONS.set(False)
+        try:
+            return self.func_raw(*values)
+        finally:
+            _CHECK_DIMENSIONS.reset(token)
+
+    def check(self, *values) -> bool:
+        """Check that the raw and safe versions agree on values."""
+        try:
+            raw = np.asarray(quantify(self._raw(*values)).value)
+        except Exception:
+            return False
+        safe = np.asarray(quantify(self.func_value(*values)).value)
+        return (raw.shape == safe.shape and
+                np.allclose(raw, safe, rtol=1e-12, atol=0, equal_nan=True))
+
+    def __call__(self, *values):
+        if self.invalidated:
+            return self.func_value(*values)
+        self.n_calls += 1
+        if (self.revalidate_every and
+                self.n_calls % self.revalidate_every == 0 and
+                not self.check(*values)):
+            self.invalidated = True
+            return self.func_value(*values)
+        try:
+            return self._raw(*values)
+        except Exception:
+            self.invalidated = True
+            return self.func_value(*values)
+
+
+def _solve_unit_erased(solve: Callable, func_value: Callable,
+                       func_raw: Callable, probes: list,
+                       erase_units: bool = False,
+                       revalidate_every: int | None = None):
+    """Run solve(f) with a float-valued function f.
+
+    If erase_units is False, func_value is used. Otherwise, func_raw is
+    validated against func_value on each tuple of values in probes, and
+    is used if all agree. If the raw version is invalidated during the
+    solve, the solve is run again with func_value.
+    """
+    if not erase_units:
+        return solve(func_value)
+    erased = _UnitErasedFunction(func_value, func_raw, revalidate_every)
+    if not all(erased.check(*values) for values in probes):
+        return solve(func_value)
+    res = solve(erased)
+    if erased.invalidated:
+        return solve(func_value)
+    return res
+
+
+def quad(func, x0, x1, *oargs, args=(), erase_units=False,
+         revalidate_every=None, **kwargs):
     """A wrapper on scipy.integrate.quad :
          - will check dimensions of x0 and x1 bounds
          - returned value's dimension is infered by calling func(x0)
+
+    With erase_units=True, func is called with Quantity objects only to
+    validate the computation, and then with raw SI-values for the rest of
+    the integration, with dimension checks disabled, which is much faster.
+    The raw computation is compared to the Quantity computation on the
+    bounds, and every revalidate_every evaluations if not None : if they
+    disagree, the integration falls back on Quantity objects. The other
+    solvers of this module accept the same keywords.
     """
     # Cast x bounds in Quantity and check dimension
     x0 = quantify(x0)
@@ -137,16 +297,177 @@ def quad(func, x0, x1, *oargs, args=(), **kwargs):
         # return float-value
         return raw.value
 
+    # same without casting back in Quantity
+    def func_raw(x_value, *oargs):
+        return quantify(func(x_value, *args)).value
+
     # compute integral with float-value version
-    quad_value, prec = scipy.integrate.quad(func_value,
-                                            x0.value, x1.value,
-                                            *oargs, **kwargs)
+    quad_value, prec = _solve_unit_erased(
+        lambda f: scipy.integrate.quad(f, x0.value, x1.value,
+                                       *oargs, **kwargs),
+        func_value, func_raw, [(x0.value,), (x1.value,)],
+        erase_units, revalidate_every)
     # cast back in Quantity with dimension f(x)dx
     return Quantity(quad_value,
                     res_dim * x0.dimension).rm_dim_if_dimless(), prec
 
 
-def dblquad(func, x0, x1, y0, y1, *oargs, args=(), **kwargs):
+def quad_vec(func, x0, x1, *oargs, args=(), points=None, epsabs=None,
+             erase_units=False, revalidate_every=None, **kwargs):
+    """A wrapper on scipy.integrate.quad_vec, to integrate an array-valued
+    func in a single adaptive pass :
+         - will check dimensions of x0 and x1 bounds, and of points
+         - returned value's dimension is infered by calling func(x0)
+         - epsabs, if given, must have the dimension of the integral
+
+    Returns the integral as a Quantity array, the estimated error, and the
+    info object if full_output=True, like scipy.integrate.quad_vec. See quad
+    for erase_units and revalidate_every.
+
+    Examples
+    --------
+    >>> from physipy import m, s
+    >>> speeds = np.array([1, 2, 3]) * m/s
+    >>> res, err = quad_vec(lambda t: speeds * t/s, 0*s, 2*s)
+    >>> print(res)
+    [2. 4. 6.] m
+    """
+    x0 = quantify(x0)
+    x1 = quantify(x1)
+    if not x0.dimension == x1.dimension:
+        raise DimensionError(x0.dimension, x1.dimension)
+
+    # Get output dimension
+    res_dim = quantify(func(x0, *args)).dimension
+    quad_dim = res_dim * x0.dimension
+
+    if points is not None:
+        points = quantify(points)
+        if not points.dimension == x0.dimension:
+            raise DimensionError(x0.dimension, points.dimension)
+        kwargs["points"] = points.value
+    if epsabs is not None:
+        epsabs = quantify(epsabs)
+        if not epsabs.dimension == quad_dim:
+            raise DimensionError(quad_dim, epsabs.dimension)
+        kwargs["epsabs"] = epsabs.value
+
+    def func_value(x_value):
+        return quantify(func(Quantity(x_value, x0.dimension), *args)).value
+
+    def func_raw(x_value):
+        return quantify(func(x_value, *args)).value
+
+    quad_value, *others = _solve_unit_erased(
+        lambda f: scipy.integrate.quad_vec(f, x0.value, x1.value,
+                                           *oargs, **kwargs),
+        func_value, func_raw, [(x0.value,), (x1.value,)],
+        erase_units, revalidate_every)
+    return (Quantity(quad_value, quad_dim).rm_dim_if_dimless(), *others)
+
+
+# Gauss-Kronrod 15 points rule on [-1, 1], and the weights of the embedded
+# Gauss 7 points rule (zero on the Kronrod-only nodes), from QUADPACK's qk15
+_K15_POSITIVE_NODES = np.array([
+    0.991455371120812639206854697526329,
+    0.949107912342758524526189684047851,
+    0.864864423359769072789712788640926,
+    0.741531185599394439863864773280788,
+    0.586087235467691130294144845693013,
+    0.405845151377397166906606412076961,
+    0.207784955007898467600689403773245,
+])
+_K15_POSITIVE_WEIGHTS = np.array([
+    0.022935322010529224963732008058970,
+    0.063092092629978553290700663189204,
+    0.104790010322250183839876322541518,
+    0.140653259715525918745189590510238,
+    0.169004726639267902826583426598550,
+    0.190350578064785409913256402421014,
+    0.204432940075298892414161999234649,
+])
+_G7_POSITIVE_WEIGHTS = np.array([
+    0, 0.129484966168869693270611432679082,
+    0, 0.279705391489276667901467771423780,
+    0, 0.381830050505118944950369775488975,
+    0,
+])
+_K15_NODES = np.concatenate([-_K15_POSITIVE_NODES, [0],
+                             _K15_POSITIVE_NODES[::-1]])
+_K15_WEIGHTS = np.concatenate([_K15_POSITIVE_WEIGHTS,
+                               [0.209482141084727828012999174891714],
+                               _K15_POSITIVE_WEIGHTS[::-1]])
+_G7_WEIGHTS = np.concatenate([_G7_POSITIVE_WEIGHTS,
+                              [0.417959183673469387755102040816327],
+                              _G7_POSITIVE_WEIGHTS[::-1]])
+
+
+def fixed_quad(func, x0, x1, args=(), n=5, kronrod=False):
+    """Integrate func over arrays of intervals with a fixed-order rule.
+
+    Like scipy.integrate.fixed_quad, but x0 and x1 can be Quantity arrays
+    of bounds : all the integrals are computed with a single call to func,
+    on a grid of nodes of shape np.broadcast(x0, x1).shape + (n,). func
+    must hence be vectorized, and the node axis is the last one (arrays in
+    args must broadcast against the grid, eg have a trailing axis of
+    length 1).
+
+    Parameters
+    ----------
+    func : callable
+        Function to integrate, func(x, *args).
+    x0, x1 : Quantity or array-like
+        Lower and upper bounds, with the same dimension.
+    args : tuple, defaults to ()
+        Extra arguments passed to func.
+    n : int, defaults to 5
+        Order of the Gauss-Legendre rule, exact for polynomials of degree
+        up to 2n-1. Ignored if kronrod is True.
+    kronrod : bool, defaults to False
+        If True, use the 15 points Gauss-Kronrod rule and estimate the
+        error with the embedded 7 points Gauss rule.
+
+    Returns
+    -------
+    value : Quantity
+        Integrals, with dimension func(x).dimension * x.dimension.
+    err : Quantity or None
+        Estimated absolute errors if kronrod is True, else None.
+
+    Examples
+    --------
+    >>> from physipy import m
+    >>> res, err = fixed_quad(lambda x: 3*x**2, 0*m, np.array([1, 2, 3])*m)
+    >>> print(res)
+    [ 1.  8. 27.] m**3
+    """
+    x0 = quantify(x0)
+    x1 = quantify(x1)
+    if not x0.dimension == x1.dimension:
+        raise DimensionError(x0.dimension, x1.dimension)
+
+    if kronrod:
+        nodes, weights = _K15_NODES, _K15_WEIGHTS
+    else:
+        nodes, weights = np.polynomial.legendre.leggauss(n)
+    start, stop = np.broadcast_arrays(np.asarray(x0.value, dtype=float),
+                                      np.asarray(x1.value, dtype=float))
+    half = (stop - start)[..., np.newaxis] / 2
+    center = (stop + start)[..., np.newaxis] / 2
+    fx = quantify(func(Quantity(center + half * nodes, x0.dimension),
+                       *args))
+    res_dim = fx.dimension * x0.dimension
+    half = half[..., 0]
+    value = half * np.sum(fx.value * weights, axis=-1)
+    if not kronrod:
+        return Quantity(value, res_dim).rm_dim_if_dimless(), None
+    err = np.abs(value - half * np.sum(fx.value * _G7_WEIGHTS, axis=-1))
+    return (Quantity(value, res_dim).rm_dim_if_dimless(),
+            Quantity(err, res_dim).rm_dim_if_dimless())
+
+
+def dblquad(func, x0, x1, y0, y1, *oargs, args=(), erase_units=False,
+            revalidate_every=None, **kwargs):
     x0 = quantify(x0)
     x1 = quantify(x1)
     y0 = quantify(y0)
@@ -168,15 +489,21 @@ def dblquad(func, x0, x1, y0, y1, *oargs, args=(), **kwargs):
         raw = quantify(res_raw)
         return raw.value
 
-    dblquad_value, prec = scipy.integrate.dblquad(func_value,
-                                                  x0.value, x1.value,
-                                                  y0.value, y1.value,
-                                                  *oargs, **kwargs)
+    def func_raw(y_value, x_value, *args):
+        return quantify(func(y_value, x_value, *args)).value
+
+    dblquad_value, prec = _solve_unit_erased(
+        lambda f: scipy.integrate.dblquad(f, x0.value, x1.value,
+                                          y0.value, y1.value,
+                                          *oargs, **kwargs),
+        func_value, func_raw, [(y0.value, x0.value), (y1.value, x1.value)],
+        erase_units, revalidate_every)
     return Quantity(dblquad_value, res_dim * x0.dimension *
                     y0.dimension).rm_dim_if_dimless(), prec
 
 
-def tplquad(func, x0, x1, y0, y1, z0, z1, *args):
+def tplquad(func, x0, x1, y0, y1, z0, z1, *args, erase_units=False,
+            revalidate_every=None):
     x0 = quantify(x0)
     x1 = quantify(x1)
     y0 = quantify(y0)
@@ -203,11 +530,18 @@ def tplquad(func, x0, x1, y0, y1, z0, z1, *args):
         raw = quantify(res_raw)
         return raw.value
 
-    tplquad_value, prec = scipy.integrate.tplquad(func_value,
-                                                  x0.value, x1.value,
-                                                  y0.value, y1.value,
-                                                  z0.value, z1.value,
-                                                  args=args)
+    def func_raw(z_value, y_value, x_value, *args):
+        return quantify(func(z_value, y_value, x_value, *args)).value
+
+    tplquad_value, prec = _solve_unit_erased(
+        lambda f: scipy.integrate.tplquad(f, x0.value, x1.value,
+                                          y0.value, y1.value,
+                                          z0.value, z1.value,
+                                          args=args),
+        func_value, func_raw,
+        [(z0.value, y0.value, x0.value) + args,
+         (z1.value, y1.value, x1.value) + args],
+        erase_units, revalidate_every)
     return Quantity(tplquad_value, res_dim * x0.dimension *
                     y0.dimension * z0.dimension).rm_dim_if_dimless(), prec
 
@@ -222,6 +556,8 @@ def solve_ivp(
         events=None,
         vectorized=False,
         args=None,
+        erase_units=False,
+        revalidate_every=None,
         **options):
 
     not_scalar = len(Y0) > 1
@@ -267,20 +603,32 @@ def solve_ivp(
             raw_value = quantify(res_raw).value
         return raw_value
 
+    # same without casting back in Quantity
+    def func_raw(t_value, Y_value):
+        res_raw = fun(t_value, Y_value)
+        if not_scalar:
+            return np.array([quantify(r).value for r in res_raw])
+        else:
+            return quantify(res_raw).value
+
     # compute numerical solution
 
-    sol = scipy.integrate.solve_ivp(
-        func_value,
-        t_span_value,
-        Y0_value,
-        method=method,
-        t_eval=t_eval_value,
-        dense_output=dense_output,
-        events=events,
-        vectorized=vectorized,
-        args=args,
-        **options
-    )
+    sol = _solve_unit_erased(
+        lambda f: scipy.integrate.solve_ivp(
+            f,
+            t_span_value,
+            Y0_value,
+            method=method,
+            t_eval=t_eval_value,
+            dense_output=dense_output,
+            events=events,
+            vectorized=vectorized,
+            args=args,
+            **options
+        ),
+        func_value, func_raw,
+        [(t_span_value[0], np.array(Y0_value, dtype=float))],
+        erase_units, revalidate_every)
 
     # "decorate" the solution with units
     sol.t = Quantity(sol.t, t_span[0].dimension)
@@ -303,10 +651,274 @@ def solve_ivp(
     return sol
 
 
+def solve_ivp_ensemble(fun, t_span, Y0, method='RK45', t_eval=None,
+                       dense_output=False, args=(), **options):
+    """Integrate an ODE system for many initial conditions at once.
+
+    Each component of the state is given in Y0 as a Quantity array with
+    one value per member of the ensemble, so that all the trajectories are
+    integrated in a single call to scipy.integrate.solve_ivp, with
+    vectorized=True. The state is stored as a single float array, member
+    by member, along with the dimension of each component.
+
+    The members are independent, so for the implicit methods the Jacobian
+    is block-diagonal : unless jac is given, it is passed as jac_sparsity
+    to Radau and BDF, and as lband and uband to LSODA, so that its cost
+    grows linearly with the number of members.
+
+    Parameters
+    ----------
+    fun : callable
+        Right-hand side, fun(t, Y, *args), where Y is a tuple of Quantity
+        views on the state, one per component, of shape (k, n_members),
+        where k is the number of states evaluated at once by the solver
+        (1 for a single state), so that arrays of per-member parameters
+        always broadcast. Must return a tuple of derivatives, that
+        broadcast to the shape of the components, with dimension
+        component / t.
+    t_span : tuple of 2 Quantity
+        Interval of integration.
+    Y0 : list of Quantity
+        Initial conditions of each component, that are broadcasted to the
+        same shape (n_members,).
+    method, t_eval, dense_output, options :
+        Passed to scipy.integrate.solve_ivp.
+    args : tuple, defaults to ()
+        Extra arguments passed to fun.
+
+    Returns
+    -------
+    OdeResult
+        The solution of scipy.integrate.solve_ivp, with t as a Quantity,
+        y as a list of Quantity of shape (n_members, n_points), one per
+        component, and sol, if dense_output is True, returning such a
+        list for a time Quantity.
+
+    Examples
+    --------
+    >>> from physipy import m, s
+    >>> def fall(t, Y):
+    ...     z, v = Y
+    ...     return v, -10*m/s**2
+    >>> sol = solve_ivp_ensemble(fall, (0*s, 1*s), [[0, 10]*m, 0*m/s],
+    ...                          t_eval=[1]*s)
+    >>> print(sol.y[0])
+    [[-5.]
+     [ 5.]] m
+    """
+    t0 = quantify(t_span[0])
+    t1 = quantify(t_span[1])
+    if not t0.dimension == t1.dimension:
+        raise DimensionError(t0.dimension, t1.dimension)
+    t_dim = t0.dimension
+    Y0 = [quantify(y) for y in Y0]
+    dims = [y.dimension for y in Y0]
+    dy_dims = [dim / t_dim for dim in dims]
+    Y0_value = np.array(np.broadcast_arrays(*[y.value for y in Y0]),
+                        dtype=float)
+    if Y0_value.ndim != 2:
+        raise ValueError("Initial conditions must be 1D arrays.")
+    n_components, n_members = Y0_value.shape
+    if t_eval is not None:
+        t_eval = quantify(t_eval)
+        if not t_eval.dimension == t_dim:
+            raise DimensionError(t_dim, t_eval.dimension)
+        t_eval = t_eval.value
+
+    def func_value(t_value, y_value):
+        # views on the flat state, with shape (k, n_members) per component
+        state = y_value.reshape((n_members, n_components, -1))
+        Y = tuple(Quantity(state[:, i].T, dim) for i, dim in enumerate(dims))
+        dY = fun(Quantity(t_value, t_dim), Y, *args)
+        if not len(dY) == n_components:
+            raise ValueError(f"fun must return {n_components} derivatives, "
+                             f"got {len(dY)}.")
+        out = np.empty_like(state)
+        for i, (dy, dy_dim) in enumerate(zip(dY, dy_dims)):
+            dy = quantify(dy)
+            if not dy.dimension == dy_dim:
+                raise DimensionError(dy.dimension, dy_dim)
+            out[:, i].T[...] = dy.value
+        return out.reshape(y_value.shape)
+
+    # the components of a member only depend on the same member
+    method_name = getattr(method, "__name__", method)
+    if "jac" not in options:
+        if method_name in ("Radau", "BDF"):
+            options.setdefault("jac_sparsity", scipy.sparse.kron(
+                scipy.sparse.eye(n_members),
+                np.ones((n_components, n_components)), format="csc"))
+        elif method_name == "LSODA":
+            options.setdefault("lband", n_components - 1)
+            options.setdefault("uband", n_components - 1)
+
+    sol = scipy.integrate.solve_ivp(func_value, (t0.value, t1.value),
+                                    Y0_value.T.reshape(-1), method=method,
+                                    t_eval=t_eval, dense_output=dense_output,
+                                    vectorized=True, **options)
+
+    def split(y_value):
+        state = y_value.reshape((n_members, n_components) +
+                                y_value.shape[1:])
+        return [Quantity(state[:, i], dim) for i, dim in enumerate(dims)]
+
+    sol.t = Quantity(sol.t, t_dim)
+    sol.y = split(sol.y)
+    if sol.sol is not None:
+        func_sol = sol.sol
+
+        @check_dimension(t_dim)
+        def sol_q(t):
+            return split(func_sol(quantify(t).value))
+        sol.sol = sol_q
+    return sol
+
+
+class _ScaledUnknowns(object):
+    """Map a list of Quantity unknowns, with different dimensions and
+    shapes, to a flat array of dimensionless floats.
+
+    Each unknown is divided by a characteristic scale : the value of its
+    favunit if any, else its absolute initial value (1 where it is 0), so
+    that the solvers work on values of order 1.
+    """
+
+    def __init__(self, x0: list):
+        self.x0 = [quantify(x) for x in x0]
+        self.dims = [x.dimension for x in self.x0]
+        self.shapes = [np.shape(x.value) for x in self.x0]
+        scales = []
+        for x in self.x0:
+            value = np.abs(np.asarray(x.value, dtype=float))
+            if isinstance(x.favunit, Quantity) and x.favunit.value != 0:
+                value = np.full(value.shape, abs(float(x.favunit.value)))
+            scales.append(np.where(value == 0, 1., value).ravel())
+        self.sizes = [scale.size for scale in scales]
+        self.scale = np.concatenate(scales)
+
+    def to_float(self, xs: list) -> np.ndarray:
+        values = []
+        for x, dim in zip(xs, self.dims):
+            x = quantify(x)
+            if not x.dimension == dim:
+                raise DimensionError(x.dimension, dim)
+            values.append(np.ravel(x.value))
+        return np.concatenate(values) / self.scale
+
+    def split(self, z: np.ndarray) -> list:
+        return np.split(z, np.cumsum(self.sizes)[:-1], axis=-1)
+
+    def to_quantities(self, z: np.ndarray) -> list:
+        return [Quantity(value.reshape(shape), dim, favunit=x0.favunit)
+                for value, shape, dim, x0 in zip(self.split(z * self.scale),
+                                                 self.shapes, self.dims,
+                                                 self.x0)]
+
+    def derivatives(self, jac: np.ndarray, f_dim: Dimension) -> list:
+        """Split the derivatives of f with respect to the scaled unknowns,
+        along the last axis of jac, in Quantity objects."""
+        return [Quantity(block.reshape(block.shape[:-1] + shape),
+                         f_dim / dim).rm_dim_if_dimless()
+                for block, shape, dim in zip(self.split(jac / self.scale),
+                                             self.shapes, self.dims)]
+
+
+def _flatten_residuals(res):
+    """Flatten a Quantity or a list of Quantity in a float array, and
+    return a function that builds back the same structure from such an
+    array."""
+    if not isinstance(res, (list, tuple)):
+        res = quantify(res)
+        shape = np.shape(res.value)
+
+        def rebuild_one(values):
+            return Quantity(values.reshape(shape),
+                            res.dimension).rm_dim_if_dimless()
+        return np.ravel(res.value).astype(float), rebuild_one
+    res = [quantify(r) for r in res]
+    shapes = [np.shape(r.value) for r in res]
+    splits = np.cumsum([int(np.prod(shape)) for shape in shapes])[:-1]
+
+    def rebuild(values):
+        return [Quantity(value.reshape(shape), r.dimension).rm_dim_if_dimless()
+                for value, shape, r in zip(np.split(values, splits), shapes,
+                                           res)]
+    return np.concatenate([np.ravel(r.value) for r in res]).astype(float), \
+        rebuild
+
+
+def _check_no_jac(kwargs: dict) -> None:
+    if callable(kwargs.get("jac")):
+        raise ValueError("An analytical jacobian cannot be used with a list "
+                         "of unknowns.")
+
+
+def _scaled_bounds(unknowns: _ScaledUnknowns, bounds: list) -> tuple:
+    """Scale a list of (lower, upper) Quantity bounds, None for no bound,
+    in flat arrays of lower and upper bounds."""
+    lower, upper = [], []
+    for (low, high), shape, dim in zip(bounds, unknowns.shapes,
+                                       unknowns.dims):
+        for bound, default, values in ((low, -np.inf, lower),
+                                       (high, np.inf, upper)):
+            if bound is None:
+                values.append(np.full(int(np.prod(shape)), default))
+                continue
+            bound = quantify(bound)
+            if not bound.dimension == dim:
+                raise DimensionError(bound.dimension, dim)
+            values.append(np.broadcast_to(bound.value, shape).ravel())
+    return (np.concatenate(lower) / unknowns.scale,
+            np.concatenate(upper) / unknowns.scale)
+
+
+def _root_unknowns(func_cal: Callable, start: list, args=(), **kwargs):
+    _check_no_jac(kwargs)
+    unknowns = _ScaledUnknowns(start)
+    _, rebuild = _flatten_residuals(func_cal(unknowns.x0, *args))
+
+    def func_float(z):
+        return _flatten_residuals(
+            func_cal(unknowns.to_quantities(z), *args))[0]
+
+    sol = scipy.optimize.root(func_float, unknowns.to_float(unknowns.x0),
+                              **kwargs)
+    sol.x = unknowns.to_quantities(sol.x)
+    sol.fun = rebuild(sol.fun)
+    return sol
 
 
 # Generique
-def root(func_cal: Callable, start, args=(), **kwargs) -> Quantity:
+def root(func_cal: Callable, start, args=(), erase_units=False,
+         revalidate_every=None, **kwargs) -> Quantity:
+    """A wrapper on scipy.optimize.root.
+
+    For a scalar start, returns the root as a Quantity. If start is a list
+    of Quantity unknowns, possibly with different dimensions and shapes,
+    func_cal(xs, *args) receives a list of Quantity and returns a
+    Quantity or a list of Quantity residuals. The unknowns are scaled by
+    their favunit or initial value for better conditioning, and the
+    returned OptimizeResult has x as a list of Quantity and fun with the
+    structure of the residuals. erase_units is only available for a
+    scalar start.
+
+    Examples
+    --------
+    >>> from physipy import m, units
+    >>> Pa = units["Pa"]
+    >>> def residuals(xs):
+    ...     thickness, pressure = xs
+    ...     return [pressure*thickness - 2e-4*Pa*m,
+    ...             pressure - 1e14*Pa/m*thickness]
+    >>> sol = root(residuals, [1e-9*m, 1e5*Pa])
+    >>> print(sol.x[0])
+    1.4142135623730953e-09 m
+    """
+    if isinstance(start, (list, tuple)):
+        if erase_units or revalidate_every is not None:
+            raise ValueError("erase_units and revalidate_every are only "
+                             "available for a scalar start.")
+        return _root_unknowns(func_cal, start, args=args, **kwargs)
     start = quantify(start)
     start_val = start.value
     start_dim = start.dimension
@@ -314,12 +926,124 @@ def root(func_cal: Callable, start, args=(), **kwargs) -> Quantity:
     def func_cal_float(x_float):
         q = Quantity(x_float, start_dim)
         return func_cal(q, *args)
-    res = scipy.optimize.root(func_cal_float, start_val, **kwargs).x[0]
+
+    def func_cal_raw(x_float):
+        return quantify(func_cal(x_float, *args)).value
+    res = _solve_unit_erased(
+        lambda f: scipy.optimize.root(f, start_val, **kwargs),
+        func_cal_float, func_cal_raw, [(np.atleast_1d(start_val),)],
+        erase_units, revalidate_every).x[0]
     return Quantity(res, start_dim)
 
 
+def least_squares(func_cal: Callable, start: list, args=(), bounds=None,
+                  **kwargs):
+    """A wrapper on scipy.optimize.least_squares, for a list of Quantity
+    unknowns.
+
+    func_cal(xs, *args) receives a list of Quantity, possibly with
+    different dimensions and shapes, and returns the residuals, a
+    Quantity with a single dimension. The unknowns are scaled by their
+    favunit or initial value for better conditioning.
+
+    Parameters
+    ----------
+    func_cal : callable
+        Residuals function.
+    start : list of Quantity
+        Initial guesses of the unknowns.
+    args : tuple, defaults to ()
+        Extra arguments passed to func_cal.
+    bounds : list of tuple of Quantity, defaults to None
+        (lower, upper) bounds for each unknown.
+    kwargs :
+        Passed to scipy.optimize.least_squares.
+
+    Returns
+    -------
+    OptimizeResult
+        With x a list of Quantity, fun the residuals, cost a Quantity, and
+        jac and grad lists with the derivatives of the residuals and of
+        the cost with respect to each unknown.
+    """
+    _check_no_jac(kwargs)
+    unknowns = _ScaledUnknowns(start)
+    res0 = quantify(func_cal(unknowns.x0, *args))
+    res_dim = res0.dimension
+    _, rebuild = _flatten_residuals(res0)
+    if bounds is not None:
+        kwargs["bounds"] = _scaled_bounds(unknowns, bounds)
+
+    def func_float(z):
+        return _flatten_residuals(
+            func_cal(unknowns.to_quantities(z), *args))[0]
+
+    sol = scipy.optimize.least_squares(func_float,
+                                       unknowns.to_float(unknowns.x0),
+                                       **kwargs)
+    sol.x = unknowns.to_quantities(sol.x)
+    sol.fun = rebuild(sol.fun)
+    sol.cost = Quantity(sol.cost, res_dim**2).rm_dim_if_dimless()
+    sol.jac = unknowns.derivatives(sol.jac, res_dim)
+    sol.grad = unknowns.derivatives(sol.grad, res_dim**2)
+    return sol
+
+
+def minimize(func_cal: Callable, start: list, args=(), bounds=None,
+             **kwargs):
+    """A wrapper on scipy.optimize.minimize, for a list of Quantity
+    unknowns.
+
+    func_cal(xs, *args) receives a list of Quantity, possibly with
+    different dimensions and shapes, and returns a scalar Quantity. The
+    unknowns are scaled by their favunit or initial value for better
+    conditioning.
+
+    Parameters
+    ----------
+    func_cal : callable
+        Objective function.
+    start : list of Quantity
+        Initial guesses of the unknowns.
+    args : tuple, defaults to ()
+        Extra arguments passed to func_cal.
+    bounds : list of tuple of Quantity, defaults to None
+        (lower, upper) bounds for each unknown, None for no bound.
+    kwargs :
+        Passed to scipy.optimize.minimize.
+
+    Returns
+    -------
+    OptimizeResult
+        With x a list of Quantity, fun a Quantity, and jac, if returned
+        by the method, a list with the derivatives of the objective with
+        respect to each unknown.
+    """
+    _check_no_jac(kwargs)
+    unknowns = _ScaledUnknowns(start)
+    f_dim = quantify(func_cal(unknowns.x0, *args)).dimension
+    if bounds is not None:
+        kwargs["bounds"] = scipy.optimize.Bounds(
+            *_scaled_bounds(unknowns, bounds))
+
+    def func_float(z):
+        res = quantify(func_cal(unknowns.to_quantities(z), *args))
+        if not res.dimension == f_dim:
+            raise DimensionError(res.dimension, f_dim)
+        return res.value
+
+    sol = scipy.optimize.minimize(func_float,
+                                  unknowns.to_float(unknowns.x0), **kwargs)
+    sol.x = unknowns.to_quantities(sol.x)
+    sol.fun = Quantity(sol.fun, f_dim).rm_dim_if_dimless()
+    if "jac" in sol:
+        sol.jac = unknowns.derivatives(sol.jac, f_dim)
+    return sol
+
+
 def brentq(func_cal: Callable, start, stop, *
-           oargs, args=(), **kwargs) -> Quantity:
+           oargs, args=(), erase_units=False, revalidate_every=None,
+           **kwargs) -> Quantity:
     start = quantify(start)
     stop = quantify(stop)
     if not start.dimension == stop.dimension:
@@ -333,6 +1057,121 @@ def brentq(func_cal: Callable, start, stop, *
         res = func_cal(Quantity(x, start_dim), *args)
         return quantify(res).value
 
-    res = scipy.optimize.brentq(func_float, start_val, stop.value, *oargs)
+    def func_raw(x):
+        return quantify(func_cal(x, *args)).value
+
+    res = _solve_unit_erased(
+        lambda f: scipy.optimize.brentq(f, start_val, stop.value, *oargs),
+        func_float, func_raw, [(start_val,), (stop_val,)],
+        erase_units, revalidate_every)
 
     return Quantity(res, start_dim)
+
+
+def chandrupatla(func_cal: Callable, start, stop, args=(), xtol=None,
+                 rtol=4 * np.finfo(float).eps, maxiter=100,
+                 full_output=False):
+    """Find roots of a vectorized function in arrays of brackets.
+
+    All the roots are searched simultaneously with Chandrupatla's method, a
+    bracketing method that combines bisection and inverse quadratic
+    interpolation, like brentq. func_cal is called once per iteration on
+    the whole array of current estimates, and elements that have converged
+    are frozen.
+
+    Parameters
+    ----------
+    func_cal : callable
+        Vectorized function, func_cal(x, *args), that returns an array
+        with the shape of x. Arrays in args must broadcast against the
+        brackets.
+    start, stop : Quantity or array-like
+        Brackets, with the same dimension and broadcastable shapes.
+        func_cal must have opposite signs at start and stop.
+    args : tuple, defaults to ()
+        Extra arguments passed to func_cal.
+    xtol : Quantity, defaults to None
+        Absolute tolerance on the roots, with the dimension of the
+        brackets. Defaults to 2e-12 in SI units, like brentq.
+    rtol : float, defaults to 4 times the machine epsilon
+        Relative tolerance on the roots.
+    maxiter : int, defaults to 100
+        Maximum number of iterations.
+    full_output : bool, defaults to False
+        If True, also return a boolean array telling which roots have
+        converged.
+
+    Returns
+    -------
+    Quantity
+        Roots, with the dimension of the brackets.
+
+    Examples
+    --------
+    >>> from physipy import m
+    >>> areas = np.array([1, 4, 9]) * m**2
+    >>> print(chandrupatla(lambda x: x**2 - areas, 0*m, 10*m))
+    [1. 2. 3.] m
+    """
+    start = quantify(start)
+    stop = quantify(stop)
+    if not start.dimension == stop.dimension:
+        raise DimensionError(start.dimension, stop.dimension)
+    x_dim = start.dimension
+    if xtol is None:
+        xtol = 2e-12
+    else:
+        xtol = quantify(xtol)
+        if not xtol.dimension == x_dim:
+            raise DimensionError(x_dim, xtol.dimension)
+        xtol = xtol.value
+
+    def func_value(x_value):
+        res = quantify(func_cal(Quantity(x_value, x_dim), *args))
+        if not res.dimension == f_dim:
+            raise DimensionError(f_dim, res.dimension)
+        return res.value
+
+    b = np.asarray(start.value, dtype=float)
+    a = np.asarray(stop.value, dtype=float)
+    f_dim = quantify(func_cal(start, *args)).dimension
+    fb = func_value(b)
+    fa = func_value(a)
+    # the shape of the roots may come from args
+    b, a, fb, fa = np.broadcast_arrays(b, a, fb, fa)
+    if np.any(np.sign(fa) * np.sign(fb) > 0):
+        raise ValueError("func_cal must have different signs at start "
+                         "and stop.")
+    c, fc = a, fa
+    t = np.full(a.shape, 0.5)
+    xm = np.where(np.abs(fa) < np.abs(fb), a, b)
+    active = (fa != 0) & (fb != 0)
+    xm = np.where(fa == 0, a, np.where(fb == 0, b, xm))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for _ in range(maxiter):
+            if not np.any(active):
+                break
+            xt = a + t * (b - a)
+            ft = np.where(active, func_value(xt), fa)
+            same_sign = np.sign(ft) == np.sign(fa)
+            c, fc = np.where(same_sign, a, b), np.where(same_sign, fa, fb)
+            b, fb = np.where(same_sign, b, a), np.where(same_sign, fb, fa)
+            a, fa = xt, ft
+            a_is_best = np.abs(fa) < np.abs(fb)
+            xm = np.where(active, np.where(a_is_best, a, b), xm)
+            fm = np.where(a_is_best, fa, fb)
+            tol = 2 * rtol * np.abs(xm) + xtol
+            tlim = tol / np.abs(b - c)
+            active &= (tlim < 0.5) & (fm != 0)
+            # inverse quadratic interpolation where valid, else bisection
+            xi = (a - b) / (c - b)
+            phi = (fa - fb) / (fc - fb)
+            iqi = (phi**2 < xi) & ((1 - phi)**2 < 1 - xi)
+            t_iqi = (fa / (fb - fa) * fc / (fb - fc) +
+                     (c - a) / (b - a) * fa / (fc - fa) * fb / (fc - fb))
+            t = np.clip(np.where(iqi, t_iqi, 0.5), tlim, 1 - tlim)
+            t = np.where(np.isfinite(t), t, 0.5)
+    roots = Quantity(xm, x_dim)
+    if full_output:
+        return roots, ~active
+    return roots
@@ -0,0 +1,530 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Save and load Quantity objects to disk, or map them from disk.
+
+Quantities are stored in numpy's .npz format : the SI-values are written as
+regular .npy members, and a small JSON header member holds, for each of
+them, the dimension exponents, the symbol and the favunit.
+
+Since np.savez does not compress the members, they can be memory-mapped
+straight from the archive when loading with mmap_mode, so opening a large
+file does not read nor copy the data.
+
+Raw binary files can also be wrapped as Quantity objects with qmemmap.
+
+Text sources of "value unit" strings, like "3.2 mm" or "12 km/h", are
+converted to Quantity arrays with parse_quantities, or by chunks with
+iter_parse_quantities.
+
+Columns of quantities are written to CSV/TSV text files with savetxt, with
+headers like "pressure [kPa]", and read back with loadtxt.
+"""
+from __future__ import annotations
+import itertools
+import json
+import os
+import re
+import zipfile
+from fractions import Fraction
+
+import numpy as np
+
+from physipy import quantify, Quantity, Dimension, dimensionify, units
+from .quantity.utils import values_strunits_to_quantity, _parse_unit_str
+
+
+META_KEY = "__physipy__"
+
+
+def _number_to_json(x):
+    if isinstance(x, (int, np.integer)):
+        return int(x)
+    if isinstance(x, Fraction):
+        return str(x)
+    return float(x)
+
+
+def _json_to_number(x):
+    return Fraction(x) if isinstance(x, str) else x
+
+
+def _dimension_to_json(dim: Dimension) -> dict:
+    return {key: _number_to_json(value)
+            for key, value in dim.dim_dict.items() if value != 0}
+
+
+def _json_to_dimension(dim_json: dict) -> Dimension:
+    return Dimension({key: _json_to_number(value)
+                      for key, value in dim_json.items()})
+
+
+def _quantity_meta(q: Quantity) -> dict:
+    meta = {"dimension": _dimension_to_json(q.dimension),
+            "symbol": str(q.symbol),
+            "favunit": None}
+    if isinstance(q.favunit, Quantity):
+        meta["favunit"] = {"symbol": str(q.favunit.symbol),
+                           "value": _number_to_json(q.favunit.value),
+                           "dimension": _dimension_to_json(
+                               q.favunit.dimension)}
+    return meta
+
+
+def _meta_to_quantity(value, meta: dict) -> Quantity:
+    favunit = meta["favunit"]
+    if favunit is not None:
+        favunit = Quantity(_json_to_number(favunit["value"]),
+                           _json_to_dimension(favunit["dimension"]),
+                           symbol=favunit["symbol"])
+    return Quantity(value, _json_to_dimension(meta["dimension"]),
+                    symbol=meta["symbol"], favunit=favunit)
+
+
+def savez(file, *args, **kwds) -> None:
+    """Save several quantities into a single uncompressed .npz file.
+
+    Works like np.savez : positional quantities are saved with names
+    "arr_0", "arr_1", ..., and keyword quantities with their keyword name.
+    Non-Quantity values are saved as dimensionless quantities.
+
+    Parameters
+    ----------
+    file : str or file
+        Filename or file-like object where the data is saved. The ".npz"
+        extension is appended to a filename if not already present.
+    args, kwds : Quantity or array-like
+        Quantities to save.
+
+    See also
+    --------
+    save : save a single Quantity.
+    load : load quantities from a file.
+    """
+    quantities = {f"arr_{i}": q for i, q in enumerate(args)}
+    for name, q in kwds.items():
+        if name in quantities or name == META_KEY:
+            raise ValueError(f"Cannot use {name} as a name for a Quantity.")
+        quantities[name] = q
+    _savez(file, quantities, single=False)
+
+
+def save(file, q) -> None:
+    """Save a single Quantity into an uncompressed .npz file.
+
+    Examples
+    --------
+    >>> import tempfile, os
+    >>> from physipy import m, units
+    >>> q = (np.arange(3) * m).set_favunit(units["mm"])
+    >>> with tempfile.TemporaryDirectory() as tmpdir:
+    ...     path = os.path.join(tmpdir, "q.npz")
+    ...     save(path, q)
+    ...     print(load(path))
+    [   0. 1000. 2000.] mm
+
+    See also
+    --------
+    savez : save several quantities in the same file.
+    load : load quantities from a file.
+    """
+    _savez(file, {"value": q}, single=True)
+
+
+def _savez(file, quantities: dict, single: bool) -> None:
+    arrays = {}
+    meta = {"single": single, "quantities": {}}
+    for name, q in quantities.items():
+        q = quantify(q)
+        arrays[name] = np.asanyarray(q.value)
+        meta["quantities"][name] = _quantity_meta(q)
+    arrays[META_KEY] = np.array(json.dumps(meta))
+    np.savez(file, **arrays)
+
+
+def _memmap_npz_member(file, name: str, mmap_mode: str) -> np.memmap:
+    """Memory-map an uncompressed .npy member of a .npz archive."""
+    with zipfile.ZipFile(file) as zf:
+        info = zf.getinfo(name + ".npy")
+    if info.compress_type != zipfile.ZIP_STORED:
+        raise ValueError(f"Cannot memory-map compressed member {name}.")
+    with open(file, "rb") as f:
+        # the data follows the local file header, which is 30 bytes plus
+        # the filename and extra field lengths
+        f.seek(info.header_offset + 26)
+        name_len = int.from_bytes(f.read(2), "little")
+        extra_len = int.from_bytes(f.read(2), "little")
+        f.seek(info.header_offset + 30 + name_len + extra_len)
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            header = np.lib.format.read_array_header_1_0(f)
+        else:
+            header = np.lib.format.read_array_header_2_0(f)
+        shape, fortran_order, dtype = header
+        if dtype.hasobject:
+            raise ValueError(f"Cannot memory-map object array {name}.")
+        offset = f.tell()
+    return np.memmap(file, dtype=dtype, mode=mmap_mode, shape=shape,
+                     order="F" if fortran_order else "C", offset=offset)
+
+
+def load(file, mmap_mode: str | None = None):
+    """Load quantities saved with save or savez.
+
+    Parameters
+    ----------
+    file : str or file
+        The file to read. Must be a filename if mmap_mode is used.
+    mmap_mode : {None, "r", "c"}, defaults to None
+        If not None, the values are memory-mapped from the file with the
+        given mode (see np.memmap) instead of being read in memory : "r"
+        for read-only, "c" for copy-on-write. Writable modes are not
+        supported, since writing in a member of the archive would not
+        update its CRC, and "w+" would truncate the archive.
+
+    Returns
+    -------
+    Quantity or dict
+        A Quantity if the file was written with save, otherwise a dict with
+        keys the names of the quantities and values the quantities.
+    """
+    if mmap_mode not in (None, "r", "c"):
+        raise ValueError(f"mmap_mode must be None, 'r' or 'c', "
+                         f"got {mmap_mode!r}.")
+    with np.load(file, allow_pickle=False) as npz:
+        meta = json.loads(npz[META_KEY][()])
+        values = {}
+        for name in meta["quantities"]:
+            if mmap_mode is None:
+                value = npz[name]
+                # restore scalars saved as 0-d arrays
+                values[name] = value[()] if value.ndim == 0 else value
+            else:
+                values[name] = None
+    if mmap_mode is not None:
+        values = {name: _memmap_npz_member(file, name, mmap_mode)
+                  for name in values}
+    quantities = {name: _meta_to_quantity(values[name], q_meta)
+                  for name, q_meta in meta["quantities"].items()}
+    if meta["single"]:
+        return quantities["value"]
+    return quantities
+
+
+def qmemmap(filename, unit, dtype=np.float64, mode: str = "r+",
+            offset: int = 0, shape=None, order: str = "C",
+            favunit: Quantity | None = None) -> Quantity:
+    """Create a Quantity backed by a memory-mapped file.
+
+    The data is not read in memory : slicing the returned Quantity gives
+    Quantity objects whose value is a view on the mapped file, and numpy
+    reductions (np.sum, np.mean, ...) read the mapped pages directly.
+
+    Parameters
+    ----------
+    filename : str, file-like or np.memmap
+        The file to map, or an already existing np.memmap to wrap.
+    unit : Quantity, Dimension or str
+        The unit of the values in the file. Since Quantity objects store
+        SI-values, the values must be stored in SI units : a Quantity unit
+        must have a value of 1.
+    dtype, mode, offset, shape, order :
+        Passed to np.memmap, ignored if filename is already a np.memmap.
+    favunit : Quantity, defaults to None
+        Favunit of the returned Quantity.
+
+    Returns
+    -------
+    Quantity
+        A Quantity with a np.memmap value.
+    """
+    if isinstance(unit, Quantity):
+        if not unit.value == 1:
+            raise ValueError(
+                f"Values must be stored in SI units to be mapped without "
+                f"copy, but got unit {unit.symbol} with SI-value "
+                f"{unit.value}.")
+        dimension = unit.dimension
+    else:
+        dimension = dimensionify(unit)
+    if isinstance(filename, np.memmap):
+        value = filename
+    else:
+        value = np.memmap(filename, dtype=dtype, mode=mode, offset=offset,
+                          shape=shape, order=order)
+    return Quantity(value, dimension, favunit=favunit)
+
+
+# a number, optionally followed by a unit expression, on each line
+_VALUE_UNIT_RE = re.compile(
+    r"^([-+]?(?:(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?|inf|nan))"
+    r"[ \t]*(.*)$", re.IGNORECASE | re.MULTILINE)
+
+
+def _split_values_units(strings: list) -> tuple:
+    """Split "value unit" strings in an array of values and unit strings.
+
+    The strings are joined in a single text, split at once by the regex :
+    the values and units alternate with the separators, that must all be
+    newlines if each string matched.
+    """
+    if len(strings) == 0:
+        return np.empty(0), []
+    strings = [string.strip() for string in strings]
+    parts = _VALUE_UNIT_RE.split("\n".join(strings))
+    separators = parts[0::3]
+    if (len(separators) != len(strings) + 1
+            or separators[0] != "" or separators[-1] != ""
+            or separators.count("\n") != len(strings) - 1):
+        for string in strings:
+            if "\n" in string or _VALUE_UNIT_RE.match(string) is None:
+                raise ValueError(f"Cannot parse {string!r} as a value "
+                                 f"followed by a unit.")
+    return np.array(parts[1::3], dtype=float), parts[2::3]
+
+
+def parse_quantities(strings, parsing_dict: dict | None = None):
+    """Parse "value unit" strings to a Quantity array in SI.
+
+    Each string is split in a number and a unit expression with a compiled
+    regex, like "3.2 mm", "1.5e3 kPa" or "12 km/h". Strings without unit
+    are dimensionless. Each distinct unit is parsed once.
+
+    Parameters
+    ----------
+    strings : iterable of str or array of str
+        The strings to parse.
+    parsing_dict : dict, defaults to None
+        Units to use for parsing, defaults to physipy.units.
+
+    Returns
+    -------
+    Quantity or tuple
+        If all units have the same dimension, a Quantity with SI-values.
+        Otherwise, a tuple with the SI-values and an object array of the
+        dimensions of each value.
+
+    Examples
+    --------
+    >>> print(parse_quantities(["3.2 mm", "1.5e3 m", "2km"]))
+    [3.2e-03 1.5e+03 2.0e+03] m
+
+    See also
+    --------
+    iter_parse_quantities : parse strings by chunks.
+    """
+    if parsing_dict is None:
+        parsing_dict = units
+    if isinstance(strings, np.ndarray):
+        shape = strings.shape
+        strings = strings.astype(str).ravel().tolist()
+    else:
+        strings = list(strings)
+        shape = (len(strings),)
+    values, unit_strs = _split_values_units(strings)
+    return values_strunits_to_quantity(values.reshape(shape),
+                                       np.reshape(unit_strs, shape),
+                                       parsing_dict)
+
+
+def iter_parse_quantities(strings, parsing_dict: dict | None = None,
+                          chunksize: int = 65536):
+    """Parse "value unit" strings by chunks, see parse_quantities.
+
+    Use it for sources that do not fit in memory, like the lines of a
+    file : blank strings are skipped.
+
+    Parameters
+    ----------
+    strings : iterable of str
+        The strings to parse, like an open text file.
+    parsing_dict : dict, defaults to None
+        Units to use for parsing, defaults to physipy.units.
+    chunksize : int, defaults to 65536
+        Number of strings parsed at once.
+
+    Yields
+    ------
+    Quantity or tuple
+        The result of parse_quantities for each chunk.
+
+    Examples
+    --------
+    >>> lines = ["1 mm", "2 mm", " ", "3 mm"]
+    >>> for q in iter_parse_quantities(lines, chunksize=2):
+    ...     print(q)
+    [0.001 0.002] m
+    [0.003] m
+    """
+    if chunksize < 1:
+        raise ValueError(f"chunksize must be at least 1, got {chunksize}.")
+    strings = (string for string in strings if string.strip())
+    while True:
+        chunk = list(itertools.islice(strings, chunksize))
+        if not chunk:
+            return
+        yield parse_quantities(chunk, parsing_dict)
+
+
+# a column name, optionally followed by a unit in brackets
+_HEADER_RE = re.compile(r"^\s*(.*?)\s*(?:\[(.*)\])?\s*$")
+
+
+def _check_delimiter(delimiter) -> None:
+    """Check that delimiter cannot appear in a "name [unit]" header."""
+    if (not isinstance(delimiter, str) or delimiter == ""
+            or " " in delimiter
+            or any(c.isalnum() or c in "[]()*/.+-_#" for c in delimiter)):
+        raise ValueError(f"Cannot use {delimiter!r} as delimiter : it must "
+                         f"not contain spaces, nor characters of column "
+                         f"names or units.")
+
+
+def _column_unit(q: Quantity, delimiter: str, parsing_dict: dict) -> tuple:
+    """Scale factor and unit string used to write a Quantity column.
+
+    The favunit is used if its symbol can be read back as the same unit,
+    otherwise the column is written in SI units.
+    """
+    favunit = q.favunit
+    if isinstance(favunit, Quantity):
+        symbol = str(favunit.symbol).strip()
+        if symbol and not any(c in symbol for c in (delimiter, "[", "]")):
+            try:
+                unit = _header_unit(symbol, parsing_dict)
+            except ValueError:
+                unit = None
+            if (unit is not None and unit.dimension == favunit.dimension
+                    and np.isclose(unit.value, favunit.value)):
+                return favunit.value, symbol
+    return 1, q.dimension.str_SI_unit()
+
+
+def savetxt(fname, columns: dict, delimiter: str = ",",
+            fmt: str = "%.18e", parsing_dict: dict | None = None) -> None:
+    """Save columns of quantities to a CSV/TSV text file.
+
+    The header holds the name of each column followed by its unit in
+    brackets, like "pressure [kPa]". Each column is written in its favunit,
+    or in SI units if it has none or if the favunit symbol cannot be
+    parsed back with parsing_dict, converting the whole column at once.
+
+    Parameters
+    ----------
+    fname : str or file
+        Filename or file-like object where the data is saved.
+    columns : dict
+        Keys are the column names, values are 1-d quantities of the same
+        length. Non-Quantity values are saved as dimensionless.
+    delimiter : str, defaults to ","
+        Column separator, use "\\t" for TSV files. Cannot contain spaces
+        nor characters of names and units, that would split the header.
+    fmt : str, defaults to "%.18e"
+        Format of the values, passed to np.savetxt.
+    parsing_dict : dict, defaults to None
+        Units used to read the file back, defaults to physipy.units.
+
+    Examples
+    --------
+    >>> import io
+    >>> from physipy import m, units
+    >>> f = io.StringIO()
+    >>> savetxt(f, {"x": (np.arange(3)*m).set_favunit(units["mm"]),
+    ...             "n": np.arange(3)}, fmt="%g")
+    >>> print(f.getvalue())
+    x [mm],n
+    0,0
+    1000,1
+    2000,2
+    <BLANKLINE>
+
+    See also
+    --------
+    loadtxt : load the columns from a file.
+    """
+    _check_delimiter(delimiter)
+    if parsing_dict is None:
+        parsing_dict = units
+    headers = []
+    values = []
+    for name, q in columns.items():
+        if delimiter in name or "[" in name:
+            raise ValueError(f"Cannot use {name!r} as a column name.")
+        q = quantify(q)
+        value = np.asarray(q.value)
+        if value.ndim != 1:
+            raise ValueError(f"Column {name!r} must be 1-d, got shape "
+                             f"{value.shape}.")
+        if values and value.size != values[0].size:
+            raise ValueError(f"All columns must have the same length, got "
+                             f"{values[0].size} and {value.size} for "
+                             f"column {name!r}.")
+        scale, unit_str = _column_unit(q, delimiter, parsing_dict)
+        headers.append(f"{name} [{unit_str}]" if unit_str else name)
+        values.append(value / scale)
+    np.savetxt(fname, np.column_stack(values), fmt=fmt, delimiter=delimiter,
+               header=delimiter.join(headers), comments="")
+
+
+def _header_unit(unit_str: str, parsing_dict: dict):
+    """Parse a header unit, to a unit with the header symbol."""
+    if unit_str in parsing_dict:
+        return quantify(parsing_dict[unit_str])
+    unit = _parse_unit_str(unit_str, parsing_dict)
+    return Quantity(unit.value, unit.dimension, symbol=unit_str)
+
+
+def loadtxt(fname, delimiter: str = ",", parsing_dict: dict | None = None,
+            **kwargs) -> dict:
+    """Load columns of quantities from a CSV/TSV text file.
+
+    The first line must hold the names of the columns, optionally followed
+    by their unit in brackets, like "pressure [kPa]", as written by
+    savetxt. Each unit is parsed once, and the values are read at once with
+    np.loadtxt, then converted to SI.
+
+    Parameters
+    ----------
+    fname : str or file
+        The file to read.
+    delimiter : str, defaults to ","
+        Column separator, use "\\t" for TSV files, see savetxt.
+    parsing_dict : dict, defaults to None
+        Units to use for parsing the header, defaults to physipy.units.
+    kwargs :
+        Passed to np.loadtxt.
+
+    Returns
+    -------
+    dict
+        Keys are the column names, values are quantities with the header
+        unit as favunit, or plain arrays for columns without unit.
+    """
+    _check_delimiter(delimiter)
+    if parsing_dict is None:
+        parsing_dict = units
+    if isinstance(fname, (str, os.PathLike)):
+        with open(fname) as f:
+            return loadtxt(f, delimiter=delimiter, parsing_dict=parsing_dict,
+                           **kwargs)
+    header = fname.readline().lstrip("#")
+    names = []
+    columns_units = []
+    for column in header.split(delimiter):
+        name, unit_str = _HEADER_RE.match(column).groups()
+        names.append(name)
+        columns_units.append(_header_unit(unit_str.strip(), parsing_dict)
+                             if unit_str and unit_str.strip() else None)
+    data = np.loadtxt(fname, delimiter=delimiter, ndmin=2, **kwargs)
+    if data.shape[1] != len(names) and data.size > 0:
+        raise ValueError(f"Header has {len(names)} columns, but data has "
+                         f"{data.shape[1]}.")
+    columns = {}
+    for i, (name, unit) in enumerate(zip(names, columns_units)):
+        value = data[:, i] if data.size > 0 else np.empty(0)
+        if unit is None:
+            columns[name] = value
+        else:
+            columns[name] = Quantity(value * unit.value, unit.dimension,
+                                     favunit=unit)
+    return columns
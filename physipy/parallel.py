@@ -0,0 +1,257 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Helpers to use Quantity objects with process pools.
+
+Sending a Quantity to a worker process pickles and copies its value for
+every task. With share_quantity, the value is copied once in a
+multiprocessing.shared_memory block, and only a lightweight handle is sent
+to the workers, that get back a Quantity viewing the shared block.
+
+Functions that cannot be vectorized can be mapped over a Quantity array on
+a process pool with parallel_vectorize.
+"""
+from __future__ import annotations
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Callable
+from multiprocessing import shared_memory
+import math
+import os
+import weakref
+
+import numpy as np
+
+from physipy import quantify, Quantity, Dimension, DimensionError
+from .quantity.dimension import SI_SYMBOL_LIST
+from .quantity.utils import asqarray
+
+
+def _attach_block(name: str) -> shared_memory.SharedMemory:
+    try:
+        # python >= 3.13 : the block is owned by the creating process
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+class SharedQuantity(object):
+    """Handle on a Quantity whose value is stored in shared memory.
+
+    Use share_quantity to create it. The handle can be sent to worker
+    processes : only the name of the shared memory block, the shape, the
+    dtype, the dimension, the symbol and the favunit are pickled.
+    Use the quantity attribute to get a Quantity viewing the shared block,
+    without copy.
+
+    Each access to the quantity attribute maps the block in the process,
+    and the mapping is closed once the returned Quantity and all the views
+    of its value are garbage collected, so no mapping outlives its
+    quantities.
+
+    The process that created the handle owns the block : it must call
+    unlink once the workers are done, or use the handle as a context
+    manager.
+    """
+
+    def __init__(self, name: str, shape: tuple, dtype: str,
+                 dim_powers: tuple, symbol, favunit, owner: bool = False,
+                 shm: shared_memory.SharedMemory | None = None):
+        self.name = name
+        self.shape = shape
+        self.dtype = dtype
+        self.dim_powers = dim_powers
+        self.symbol = symbol
+        self.favunit = favunit
+        self.owner = owner
+        # mapping kept open by the owner, so that the block exists until
+        # it is unlinked
+        self._shm = shm
+
+    @property
+    def quantity(self) -> Quantity:
+        """Quantity with value viewing the shared memory block."""
+        shm = _attach_block(self.name)
+        value = np.ndarray(self.shape, dtype=np.dtype(self.dtype),
+                           buffer=shm.buf)
+        # views of value keep it alive through their base, so the mapping
+        # is closed once the last of them is collected
+        finalizer = weakref.finalize(value, shm.close)
+        # at exit, quantities may still be alive
+        finalizer.atexit = False
+        return Quantity(value,
+                        _powers_dim(self.dim_powers),
+                        symbol=self.symbol, favunit=self.favunit)
+
+    def __reduce__(self):
+        # handles received by workers do not own the block
+        return (self.__class__, (self.name, self.shape, self.dtype,
+                                 self.dim_powers, self.symbol, self.favunit))
+
+    def close(self) -> None:
+        """Close the mapping of the block held by the owner handle.
+
+        Quantities returned by the quantity attribute are not affected :
+        their mappings are closed when they are garbage collected.
+        """
+        if self._shm is not None:
+            self._shm.close()
+            self._shm = None
+
+    def unlink(self) -> None:
+        """Release the shared memory block.
+
+        The name of the block is removed, and its memory is freed once all
+        the quantities viewing it, in any process, are garbage collected.
+        Only the owner of the block, ie the process that called
+        share_quantity, can release it.
+        """
+        if not self.owner:
+            raise RuntimeError("Only the process that shared the Quantity "
+                               "can release the shared memory block.")
+        if self._shm is None:
+            self._shm = _attach_block(self.name)
+        self._shm.unlink()
+        self.close()
+
+    def __enter__(self) -> SharedQuantity:
+        return self
+
+    def __exit__(self, type, value, tb) -> None:
+        if self.owner:
+            self.unlink()
+
+    def __repr__(self) -> str:
+        return (f"<{self.__class__.__name__} : {self.name}, "
+                f"shape={self.shape}, dtype={self.dtype}>")
+
+
+def share_quantity(q) -> SharedQuantity:
+    """Copy the value of a Quantity in shared memory.
+
+    The returned handle can be passed to worker processes instead of the
+    Quantity itself, so that the value is copied once instead of once per
+    task.
+
+    Parameters
+    ----------
+    q : Quantity or array-like
+        Quantity to share.
+
+    Returns
+    -------
+    SharedQuantity
+        Handle on the shared Quantity, owning the shared memory block.
+
+    Examples
+    --------
+    >>> from physipy import m
+    >>> with share_quantity(np.arange(3.)*m) as handle:
+    ...     # pass handle to workers, that use handle.quantity
+    ...     print(handle.quantity)
+    [0. 1. 2.] m
+    """
+    q = quantify(q)
+    value = np.asarray(q.value)
+    if value.dtype.hasobject:
+        raise TypeError("Cannot share a Quantity with object value.")
+    # a block cannot be empty
+    shm = shared_memory.SharedMemory(create=True, size=max(value.nbytes, 1))
+    shared_value = np.ndarray(value.shape, dtype=value.dtype, buffer=shm.buf)
+    shared_value[...] = value
+    del shared_value
+    return SharedQuantity(shm.name, value.shape, value.dtype.str,
+                          _dim_powers(q.dimension),
+                          q.symbol, q.favunit, owner=True, shm=shm)
+
+
+def _dim_powers(dimension: Dimension) -> tuple:
+    return tuple(dimension.dim_dict[key] for key in SI_SYMBOL_LIST)
+
+
+def _powers_dim(dim_powers: tuple) -> Dimension:
+    return Dimension(dict(zip(SI_SYMBOL_LIST, dim_powers)))
+
+
+def _map_chunk(func: Callable, values: np.ndarray, dim_powers):
+    """Apply func to each element of a chunk, in a worker process.
+
+    The elements are Quantity objects with dimension dim_powers, or raw
+    values if dim_powers is None. Returns the values and the dimension of
+    the results.
+    """
+    if dim_powers is None:
+        res = asqarray([func(x) for x in values])
+    else:
+        dimension = _powers_dim(dim_powers)
+        res = asqarray([func(Quantity(x, dimension)) for x in values])
+    return res.value, _dim_powers(res.dimension)
+
+
+def parallel_vectorize(func: Callable, chunksize: int | None = None,
+                       max_workers: int | None = None,
+                       executor: Executor | None = None) -> Callable:
+    """
+    Vectorize func over the elements of an array, on a process pool.
+
+    Like calculus.ndvectorize, func is applied to each element of the
+    input, and the output is reshaped to the input shape, but the elements
+    are processed by chunks on a ProcessPoolExecutor. Use it for expensive
+    functions that cannot be vectorized.
+
+    The chunks are sent to the workers as raw values along with the
+    dimension, and each worker returns the values and the dimension of its
+    results, so no Quantity object is pickled. The results of all chunks
+    must have the same dimension.
+
+    Parameters
+    ----------
+    func : callable
+        A function of one parameter, that can be pickled (eg defined at
+        module level).
+    chunksize : int, defaults to None
+        Number of elements per task. Defaults to splitting the input in 4
+        chunks per worker.
+    max_workers : int, defaults to None
+        Number of worker processes, defaults to the number of CPUs.
+    executor : concurrent.futures.Executor, defaults to None
+        Pool used to run the chunks, that is not shut down, so that
+        several calls reuse the same workers. If None, a
+        ProcessPoolExecutor with max_workers workers is created and shut
+        down at each call, paying the startup cost of the workers each
+        time.
+
+    Returns
+    -------
+    callable
+        Decorated function, that returns a Quantity.
+    """
+    if chunksize is not None and chunksize < 1:
+        raise ValueError(f"chunksize must be at least 1, got {chunksize}.")
+
+    def vec_func(x):
+        if isinstance(x, Quantity):
+            values = np.asarray(x.value)
+            dim_powers = _dim_powers(x.dimension)
+        else:
+            values = np.asarray(x)
+            dim_powers = None
+        shape = values.shape
+        flat = values.reshape(-1)
+        if flat.size == 0:
+            raise ValueError("Cannot vectorize over an empty array.")
+        n_workers = max_workers or os.cpu_count() or 1
+        size = chunksize or math.ceil(flat.size / (4 * n_workers))
+        chunks = [flat[i:i + size] for i in range(0, flat.size, size)]
+        map_args = ([func] * len(chunks), chunks, [dim_powers] * len(chunks))
+        if executor is not None:
+            results = list(executor.map(_map_chunk, *map_args))
+        else:
+            with ProcessPoolExecutor(n_workers) as pool:
+                results = list(pool.map(_map_chunk, *map_args))
+        res_powers = {powers for _, powers in results}
+        if len(res_powers) > 1:
+            dims = [_powers_dim(powers) for powers in res_powers]
+            raise DimensionError(dims[0], dims[1])
+        value = np.concatenate([np.atleast_1d(v) for v, _ in results])
+        return Quantity(value.reshape(shape), _powers_dim(res_powers.pop()))
+    return vec_func
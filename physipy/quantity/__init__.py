@@ -3,11 +3,12 @@
 
 from .quantity import Dimension, Quantity
 from .quantity import DimensionError, SI_UNIT_SYMBOL
-from .quantity import quantify, make_quantity, dimensionify
+from .quantity import quantify, make_quantity, dimensionify, ufunc_threads
+from .quantity import trusted_mode
 from .utils import (check_dimension, set_favunit,
                     dimension_and_favunit, drop_dimension,
                     add_back_unit_param,
-                    decorate_with_various_unit, asqarray)
+                    decorate_with_various_unit, asqarray, qgroupby)
 
 from ._plot import setup_matplotlib, plotting_context
 
@@ -62,8 +62,13 @@ PROPOSITIONS/QUESTIONS :
 """
 from __future__ import annotations
 from typing import Callable, Union
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
+import contextvars
 import math
 import numbers as nb
+import operator
+import os
 import numpy as np
 
 import sympy.printing as sp_printing
@@ -72,6 +77,7 @@ import sympy.parsing as sp_parsing
 import warnings
 
 from .dimension import Dimension, DimensionError, SI_UNIT_SYMBOL, DIMENSIONLESS
+from .dimension import SI_SYMBOL_LIST
 
 # # Constantes
 UNIT_PREFIX = " "
@@ -86,6 +92,19 @@ DEFAULT_SYMBOL = "UndefinedSymbol"
 
 HANDLED_FUNCTIONS = {}
 
+# Elementwise operations on values with at least this number of elements are
+# split in chunks inside a ufunc_threads context
+UFUNC_THREADS_MIN_SIZE = 1_000_000
+# (executor, number of chunks, minimum size) of the current ufunc_threads
+# context, None outside
+_UFUNC_THREADS = contextvars.ContextVar("physipy_ufunc_threads",
+                                        default=None)
+# False inside a trusted_mode context, and while running unit-erased code
+# (see calculus) where Quantity objects are mixed with raw SI values : the
+# dimension equality checks are then skipped
+_CHECK_DIMENSIONS = contextvars.ContextVar("physipy_check_dimensions",
+                                           default=True)
+
 
 class Quantity(object):
     """Quantity class : """
@@ -163,20 +182,20 @@ class Quantity(object):
 
     def __add__(self, y):
         y = quantify(y)
-        if not self.dimension == y.dimension:
+        if _CHECK_DIMENSIONS.get() and not self.dimension == y.dimension:
             raise DimensionError(self.dimension, y.dimension)
         # return Quantity(self.value + y.value,
         #                self.dimension)
-        return type(self)(self.value + y.value,
+        return type(self)(_elementwise(operator.add, self.value, y.value),
                           self.dimension)
 
     def __radd__(self, x): return self + x
 
     def __sub__(self, y):
         y = quantify(y)
-        if not self.dimension == y.dimension:
+        if _CHECK_DIMENSIONS.get() and not self.dimension == y.dimension:
             raise DimensionError(self.dimension, y.dimension)
-        return type(self)(self.value - y.value,
+        return type(self)(_elementwise(operator.sub, self.value, y.value),
                           self.dimension)
 
     def __rsub__(self, x): return quantify(x) - self
@@ -184,13 +203,13 @@ class Quantity(object):
     def __mul__(self, y):
         # TODO make a decorator "try_raw_then_quantify_if_fail"
         try:
-            return type(self)(self.value * y.value,
+            return type(self)(_elementwise(operator.mul, self.value, y.value),
                               self.dimension * y.dimension,
                               symbol=self.symbol + "*" + y.symbol,
                               ).rm_dim_if_dimless()
         except BaseException:
             y = quantify(y)
-            return type(self)(self.value * y.value,
+            return type(self)(_elementwise(operator.mul, self.value, y.value),
                               self.dimension * y.dimension,
                               symbol=self.symbol + "*" + y.symbol,
                               ).rm_dim_if_dimless()
@@ -206,7 +225,8 @@ class Quantity(object):
 
     def __truediv__(self, y):
         y = quantify(y)
-        return type(self)(self.value / y.value,
+        return type(self)(_elementwise(operator.truediv, self.value,
+                                       y.value),
                           self.dimension / y.dimension,
                           symbol=self.symbol + "/" + y.symbol,
                           ).rm_dim_if_dimless()
@@ -219,14 +239,14 @@ class Quantity(object):
         Quantity().remove() because more intuitive
         """
         y = quantify(y)
-        if not self.dimension == y.dimension:
+        if _CHECK_DIMENSIONS.get() and not self.dimension == y.dimension:
             raise DimensionError(self.dimension, y.dimension)
         return type(self)(self.value // y.value,
                           self.dimension).rm_dim_if_dimless()
 
     def __rfloordiv__(self, x):
         x = quantify(x)
-        if not self.dimension == x.dimension:
+        if _CHECK_DIMENSIONS.get() and not self.dimension == x.dimension:
             raise DimensionError(self.dimension, x.dimension)
         return type(self)(x.value // self.value,
                           self.dimension).rm_dim_if_dimless()
@@ -238,7 +258,7 @@ class Quantity(object):
 
         """
         y = quantify(y)
-        if not self.dimension == y.dimension:
+        if _CHECK_DIMENSIONS.get() and not self.dimension == y.dimension:
             raise DimensionError(self.dimension, y.dimension)
         return type(self)(self.value % y.value,
                           self.dimension)  # .rm_dim_if_dimless()
@@ -283,7 +303,9 @@ class Quantity(object):
         # TODO : handle array comparison to return arrays
         try:
             y = quantify(y)
-            return np.logical_and((self.value ==y.value), (self.dimension == y.dimension))
+            return np.logical_and((self.value ==y.value),
+                                  (not _CHECK_DIMENSIONS.get()
+                                   or self.dimension == y.dimension))
         except Exception as e:
             return False
 
@@ -293,14 +315,14 @@ class Quantity(object):
 
     def __gt__(self, y):
         y = quantify(y)
-        if self.dimension == y.dimension:
+        if not _CHECK_DIMENSIONS.get() or self.dimension == y.dimension:
             return self.value > y.value
         else:
             raise DimensionError(self.dimension, y.dimension)
 
     def __lt__(self, y):
         y = quantify(y)
-        if self.dimension == y.dimension:
+        if not _CHECK_DIMENSIONS.get() or self.dimension == y.dimension:
             return self.value < y.value
         else:
             raise DimensionError(self.dimension, y.dimension)
@@ -315,17 +337,17 @@ class Quantity(object):
                           favunit=self.favunit)
 
     def __complex__(self) -> complex:
-        if not self.is_dimensionless_ext():
+        if _CHECK_DIMENSIONS.get() and not self.is_dimensionless_ext():
             raise DimensionError(self.dimension, DIMENSIONLESS, binary=False)
         return complex(self.value)
 
     def __int__(self) -> int:
-        if not self.is_dimensionless_ext():
+        if _CHECK_DIMENSIONS.get() and not self.is_dimensionless_ext():
             raise DimensionError(self.dimension, DIMENSIONLESS, binary=False)
         return int(self.value)
 
     def __float__(self) -> float:
-        if not self.is_dimensionless_ext():
+        if _CHECK_DIMENSIONS.get() and not self.is_dimensionless_ext():
             raise DimensionError(self.dimension, DIMENSIONLESS, binary=False)
         return float(self.value)
 
@@ -360,18 +382,26 @@ class Quantity(object):
     def __hash__(self):
         return hash(str(self.value) + str(self.dimension))
 
-    def __reduce__(self):
+    def __reduce_ex__(self, protocol):
         """
         Overload pickle behavior :
-         - https://docs.python.org/3/library/pickle.html#object.__reduce__
+         - https://docs.python.org/3/library/pickle.html#object.__reduce_ex__
          - https://stackoverflow.com/questions/19855156/whats-the-exact-usage-of-reduce-in-pickler
-        TODO : form the doc :
-            "Although powerful, implementing __reduce__() directly in your classes is
-            error prone. For this reason, class designers should use the high-level
-            interface (i.e., __getnewargs_ex__(), __getstate__() and __setstate__()) whenever possible.
+        To keep pickles small, the dimension is stored as a tuple of
+        exponents, and the favunit as its symbol if it is a unit of the
+        units dict. The value is pickled as is : with protocol 5, numpy
+        arrays are already passed as out-of-band PickleBuffer if a
+        buffer_callback is used. Memory-mapped values are pickled as
+        plain arrays.
         """
-        return (self.__class__, (self.value,
-                self.dimension, self.symbol, self.favunit))
+        value = self.value
+        if isinstance(value, np.memmap):
+            value = value.view(np.ndarray)
+        dim_powers = tuple(self.dimension.dim_dict[key]
+                           for key in SI_SYMBOL_LIST)
+        return (_rebuild_quantity, (self.__class__, value, dim_powers,
+                                    self.symbol,
+                                    _favunit_reference(self.favunit)))
 
     def __ceil__(self):
         """
@@ -552,7 +582,7 @@ class Quantity(object):
 
     def __setitem__(self, idx, q) -> None:
         q = quantify(q)
-        if not q.dimension == self.dimension:
+        if _CHECK_DIMENSIONS.get() and not q.dimension == self.dimension:
             raise DimensionError(q.dimension, self.dimension)
         if isinstance(idx, np.bool_) and idx:
             self.valeur = q.value
@@ -756,15 +786,11 @@ class Quantity(object):
         #        return QuantityIterator(self)
         #    else:
         #        return iter(self.value)
+        # numpy looks for __array_struct__ and __array_interface__ before
+        # __array__ : do not forward them to the value so that conversions
+        # to ndarray always go through __array__
         if item.startswith('__array_'):
-            warnings.warn(f"The unit of the quantity is stripped for {item}")
-            if isinstance(self.value, np.ndarray):
-                return getattr(self.value, item)
-            else:
-                # If an `__array_` attributes is requested but the magnitude is not an ndarray,
-                # we convert the magnitude to a numpy ndarray.
-                self.value = np.array(self.value)
-                return getattr(self.value, item)
+            raise AttributeError(f"Quantity object has no attribute '{item}'")
         try:
             res = getattr(self.value, item)
             return res
@@ -772,6 +798,40 @@ class Quantity(object):
             raise AttributeError("Neither Quantity object nor its value ({}) "
                                  "has attribute '{}'".format(self.value, item))
 
+    def __array__(self, dtype=None, copy=None):
+        """Return the SI-value as a numpy array.
+
+        This is used by np.asarray/np.array and any library that converts
+        inputs to plain arrays. No copy is made unless needed (or if copy
+        is True), and the Quantity is never modified. The unit is stripped,
+        so a UserWarning is raised if the Quantity is not dimensionless.
+        """
+        if not self.is_dimensionless():
+            warnings.warn("The unit of the quantity is stripped for __array__",
+                          stacklevel=2)
+        if copy:
+            return np.array(self.value, dtype=dtype, copy=True)
+        arr = np.asarray(self.value, dtype=dtype)
+        if copy is False and not (isinstance(self.value, np.ndarray) and
+                                  np.may_share_memory(arr, self.value)):
+            raise ValueError("Unable to avoid copy while creating an array "
+                             "from the Quantity value.")
+        return arr
+
+    def __dlpack__(self, **kwargs):
+        """Export the SI-value through the DLPack protocol.
+
+        Like __array__, the unit is stripped, so a UserWarning is raised if
+        the Quantity is not dimensionless. The value is shared, not copied.
+        """
+        if not self.is_dimensionless():
+            warnings.warn("The unit of the quantity is stripped for __dlpack__",
+                          stacklevel=2)
+        return np.asarray(self.value).__dlpack__(**kwargs)
+
+    def __dlpack_device__(self):
+        return np.asarray(self.value).__dlpack_device__()
+
     # def to_numpy(self):
     #    """
     #    Needed for plt.hist(np.arange(10)*m).
@@ -811,6 +871,8 @@ class Quantity(object):
             return self._ufunc_reduce(ufunc, method, *args, **kwargs)
         elif method == "accumulate":
             return self._ufunc_accumulate(ufunc, method, *args, **kwargs)
+        elif method == "at":
+            return self._ufunc_at(ufunc, method, *args, **kwargs)
         else:
             raise NotImplementedError(
                 f"array ufunc {ufunc} with method {method} not implemented")
@@ -826,6 +888,38 @@ class Quantity(object):
             raise NotImplementedError(
                 f"array ufunc {ufunc} with method {method} not implemented")
 
+    def _ufunc_at(self, ufunc, method, *args, **kwargs):
+        """
+        The method == "at" part of __array_ufunc__ interface.
+
+        Unbuffered in-place operation on the value of the first operand, for
+        eg np.add.at(q, indices, values). The dimension of the first operand
+        cannot change, so only same-dimension binary ufuncs, and
+        multiplication/division by dimensionless values are allowed.
+        """
+        ufunc_name = ufunc.__name__
+        left = args[0]
+        if not isinstance(left, Quantity):
+            raise TypeError(
+                f"array ufunc {ufunc} with method {method} can only modify "
+                "a Quantity in-place.")
+        indices = args[1]
+        if ufunc_name in same_dim_out_2 + ("multiply", "divide",
+                                           "true_divide"):
+            other = quantify(args[2])
+            if ufunc_name in same_dim_out_2:
+                expected_dim = left.dimension
+            else:
+                expected_dim = DIMENSIONLESS
+            if not other.dimension == expected_dim:
+                raise DimensionError(expected_dim, other.dimension)
+            ufunc.at(left.value, indices, other.value, **kwargs)
+        elif ufunc_name in same_out:
+            ufunc.at(left.value, indices, **kwargs)
+        else:
+            raise NotImplementedError(
+                f"array ufunc {ufunc} with method {method} not implemented")
+
     def _ufunc_reduce(self, ufunc, method, *args, **kwargs):
         """
         The method == "reduce" part of __array_ufunc__ interface.
@@ -871,13 +965,14 @@ class Quantity(object):
 
         if ufunc_name in same_dim_out_2:
             other = quantify(args[1])
-            if not left.dimension == other.dimension:
+            if (_CHECK_DIMENSIONS.get()
+                    and not left.dimension == other.dimension):
                 raise DimensionError(left.dimension, other.dimension)
-            res = ufunc.__call__(left.value, other.value)
+            res = _elementwise(ufunc, left.value, other.value)
             return type(self)(res, left.dimension)
         elif ufunc_name in skip_2:
             other = quantify(args[1])
-            res = ufunc.__call__(left.value, other.value)
+            res = _elementwise(ufunc, left.value, other.value)
             if ufunc_name == "multiply" or ufunc_name == "matmul":
                 return type(self)(res, left.dimension * other.dimension)
             elif ufunc_name == 'divide' or ufunc_name == "true_divide":
@@ -886,22 +981,22 @@ class Quantity(object):
             elif ufunc_name == "copysign" or ufunc_name == "nextafter":
                 return type(self)(res, left.dimension)
         elif ufunc_name in no_dim_1:
-            if not left.dimension == DIMENSIONLESS:
+            if _CHECK_DIMENSIONS.get() and not left.dimension == DIMENSIONLESS:
                 raise DimensionError(left.dimension, DIMENSIONLESS)
-            res = ufunc.__call__(left.value)
+            res = _elementwise(ufunc, left.value)
             return type(self)(res, DIMENSIONLESS)
         elif ufunc_name in angle_1:
-            if not left.is_dimensionless_ext():
+            if _CHECK_DIMENSIONS.get() and not left.is_dimensionless_ext():
                 raise DimensionError(
                     left.dimension, DIMENSIONLESS, binary=True)
-            res = ufunc.__call__(left.value)
+            res = _elementwise(ufunc, left.value)
             return type(self)(res, DIMENSIONLESS).rm_dim_if_dimless()
         elif ufunc_name in same_out:
-            res = ufunc.__call__(left.value)
+            res = _elementwise(ufunc, left.value)
             return type(self)(res, left.dimension).rm_dim_if_dimless()
         elif ufunc_name in special_dict:
             if ufunc_name == "sqrt":
-                res = ufunc.__call__(left.value)
+                res = _elementwise(ufunc, left.value)
                 return type(self)(res, left.dimension**(1 / 2))
             elif ufunc_name == "power":
                 power_num = args[1]
@@ -909,22 +1004,22 @@ class Quantity(object):
                         or isinstance(power_num, float)):
                     raise TypeError(("Power must be a number, "
                                      "not {}").format(type(power_num)))
-                res = ufunc.__call__(left.value, power_num)
+                res = _elementwise(ufunc, left.value, power_num)
                 return type(self)(
                     res,
                     left.dimension ** power_num,
                     symbol=left.symbol ** power_num).rm_dim_if_dimless()
             elif ufunc_name == "reciprocal":
-                res = ufunc.__call__(left.value)
+                res = _elementwise(ufunc, left.value)
                 return type(self)(res, 1 / left.dimension)
             elif ufunc_name == "square":
-                res = ufunc.__call__(left.value)
+                res = _elementwise(ufunc, left.value)
                 return type(self)(res, left.dimension**2)
             elif ufunc_name == "cbrt":
-                res = ufunc.__call__(left.value)
+                res = _elementwise(ufunc, left.value)
                 return type(self)(res, left.dimension**(1 / 3))
             elif ufunc_name == "modf":
-                res = ufunc.__call__(left.value)
+                res = _elementwise(ufunc, left.value)
                 frac, integ = res
                 return (type(self)(frac, left.dimension),
                         type(self)(integ, left.dimension))
@@ -932,23 +1027,25 @@ class Quantity(object):
                 # both x and y should have same dim such that the ratio is
                 # dimless
                 other = quantify(args[1])
-                if not left.dimension == other.dimension:
+                if (_CHECK_DIMENSIONS.get()
+                        and not left.dimension == other.dimension):
                     raise DimensionError(left.dimension, other.dimension)
                 # use the value so that the 0-comparison works
-                res = ufunc.__call__(left.value, other.value, **kwargs)
+                res = _elementwise(ufunc, left.value, other.value, **kwargs)
                 return res
             else:
                 raise ValueError
         elif ufunc_name in same_dim_in_2_nodim_out:
             other = quantify(args[1])
-            if not left.dimension == other.dimension:
+            if (_CHECK_DIMENSIONS.get()
+                    and not left.dimension == other.dimension):
                 raise DimensionError(left.dimension, other.dimension)
-            res = ufunc.__call__(left.value, other.value)
+            res = _elementwise(ufunc, left.value, other.value)
             return res
         elif ufunc_name in inv_angle_1:
-            if not left.dimension == DIMENSIONLESS:
+            if _CHECK_DIMENSIONS.get() and not left.dimension == DIMENSIONLESS:
                 raise DimensionError(left.dimension, DIMENSIONLESS)
-            res = ufunc.__call__(left.value)
+            res = _elementwise(ufunc, left.value)
             return res
         # elif ufunc_name in inv_angle_2:
         #    other = quantify(args[1])
@@ -957,14 +1054,15 @@ class Quantity(object):
         #    res = ufunc.__call__(left.value, other.value)
         #    return res
         elif ufunc_name in same_dim_in_1_nodim_out:
-            res = ufunc.__call__(left.value)
+            res = _elementwise(ufunc, left.value)
             return res
         elif ufunc_name in no_dim_2:
             other = quantify(args[1])
-            if not (left.dimension ==
-                    DIMENSIONLESS and other.dimension == DIMENSIONLESS):
+            if _CHECK_DIMENSIONS.get() and not (
+                    left.dimension == DIMENSIONLESS
+                    and other.dimension == DIMENSIONLESS):
                 raise DimensionError(left.dimension, DIMENSIONLESS)
-            res = ufunc.__call__(left.value, other.value)
+            res = _elementwise(ufunc, left.value, other.value)
             return res
         else:
             raise ValueError("ufunc not implemented ?: ", str(ufunc))
@@ -1213,6 +1311,27 @@ def np_cumsum(a, **kwargs):
     return Quantity(np.cumsum(a.value, **kwargs), a.dimension)
 
 
+@implements(np.bincount)
+def np_bincount(x, weights=None, minlength=0):
+    if isinstance(x, Quantity):
+        if not x.dimension == DIMENSIONLESS:
+            raise DimensionError(x.dimension, DIMENSIONLESS)
+        x = x.value
+    if weights is None:
+        return np.bincount(x, minlength=minlength)
+    weights = quantify(weights)
+    return Quantity(np.bincount(x, weights=weights.value, minlength=minlength),
+                    weights.dimension, favunit=weights.favunit)
+
+
+@implements(np.unique)
+def np_unique(ar, *args, **kwargs):
+    res = np.unique(ar.value, *args, **kwargs)
+    if isinstance(res, tuple):
+        return (Quantity(res[0], ar.dimension, favunit=ar.favunit),) + res[1:]
+    return Quantity(res, ar.dimension, favunit=ar.favunit)
+
+
 @implements(np.histogram)
 def np_histogram(a, bins=10, range=None, density=None, weights=None, **kwargs):
     if range is not None:
@@ -1897,6 +2016,153 @@ def make_quantity(x, symbol="UndefinedSymbol", favunit=None):
         return Quantity(x, DIMENSIONLESS, symbol=symbol, favunit=favunit)
 
 
+def _favunit_reference(favunit):
+    """Return the symbol of favunit if it is a unit of the units dict, so
+    that it can be pickled by reference, else favunit itself."""
+    if favunit is None:
+        return None
+    from ._units import units
+    unit = units.get(str(favunit.symbol))
+    if unit is favunit:
+        return unit.symbol
+    if (unit is not None and favunit.favunit is None and
+            np.isscalar(favunit.value) and
+            unit.dimension == favunit.dimension and
+            unit.value == favunit.value):
+        return unit.symbol
+    return favunit
+
+
+def _rebuild_quantity(cls, value, dim_powers, symbol, favunit):
+    """Unpickle a Quantity pickled with Quantity.__reduce_ex__."""
+    if isinstance(favunit, str):
+        from ._units import units
+        favunit = units[favunit]
+    dimension = Dimension(dict(zip(SI_SYMBOL_LIST, dim_powers)))
+    return cls(value, dimension, symbol=symbol, favunit=favunit)
+
+
+@contextlib.contextmanager
+def ufunc_threads(n_threads: int | None = None,
+                  min_size: int = UFUNC_THREADS_MIN_SIZE):
+    """Context to run large elementwise operations on several threads.
+
+    Inside the context, ufuncs called on Quantity objects (np.exp(q),
+    np.add(q1, q2), ...) and the +, -, *, / operators are split in chunks
+    along the first axis of the broadcasted values, and the chunks are
+    computed on a thread pool, numpy releasing the GIL. The dimensions are
+    checked once, and the chunks are written in a preallocated output.
+    Operations on less than min_size elements, with object values, or with
+    keyword arguments run as usual.
+
+    Parameters
+    ----------
+    n_threads : int, defaults to None
+        Number of threads, defaults to the number of CPUs.
+    min_size : int, defaults to UFUNC_THREADS_MIN_SIZE
+        Minimum number of elements for an operation to be split.
+
+    Examples
+    --------
+    >>> from physipy import m
+    >>> x = np.arange(4.) * m
+    >>> with ufunc_threads(2, min_size=4):
+    ...     print(x * x + 1 * m**2)
+    [ 1.  2.  5. 10.] m**2
+    """
+    if n_threads is None:
+        n_threads = os.cpu_count() or 1
+    if n_threads < 1:
+        raise ValueError(f"n_threads must be at least 1, got {n_threads}.")
+    with ThreadPoolExecutor(n_threads) as executor:
+        token = _UFUNC_THREADS.set((executor, n_threads, min_size))
+        try:
+            yield
+        finally:
+            _UFUNC_THREADS.reset(token)
+
+
+@contextlib.contextmanager
+def trusted_mode():
+    """Context in which Quantity operations skip the dimension checks.
+
+    Inside the context, the dimensions of operands are not compared
+    anymore in additions, subtractions, comparisons, conversions to float
+    and ufuncs, so no DimensionError is raised : the result takes the
+    dimension of the first operand. Dimensions are still propagated by
+    multiplications, divisions and powers. Use it for the inner loops of
+    code whose dimensions have already been validated.
+
+    The setting is stored in a contextvars.ContextVar, so it only applies
+    to the current thread or asyncio task.
+
+    Examples
+    --------
+    >>> from physipy import m, s
+    >>> with trusted_mode():
+    ...     print((2*m) * (3*m) + 1*m**2)
+    7 m**2
+    """
+    token = _CHECK_DIMENSIONS.set(False)
+    try:
+        yield
+    finally:
+        _CHECK_DIMENSIONS.reset(token)
+
+
+# ufuncs equivalent to the operators on arrays and numbers, that can write
+# into a preallocated output
+_OPERATOR_UFUNCS = {
+    operator.add: np.add,
+    operator.sub: np.subtract,
+    operator.mul: np.multiply,
+    operator.truediv: np.true_divide,
+}
+
+
+def _elementwise(func, *values, **kwargs):
+    """Call func on values, by chunks if inside a ufunc_threads context.
+
+    func is a ufunc, or a function of the operator module which behaves as
+    the corresponding python operator on non-array values.
+    """
+    threads = _UFUNC_THREADS.get()
+    if threads is None or kwargs or getattr(func, "nout", 1) != 1:
+        return func(*values, **kwargs)
+    executor, n_threads, min_size = threads
+    if not all(isinstance(v, (np.ndarray, nb.Number)) for v in values):
+        return func(*values)
+    ufunc = _OPERATOR_UFUNCS.get(func, func)
+    if not isinstance(ufunc, np.ufunc):
+        return func(*values)
+    shape = np.broadcast_shapes(*(np.shape(v) for v in values))
+    if (n_threads < 2 or len(shape) == 0 or shape[0] < 2
+            or math.prod(shape) < min_size
+            or any(np.asarray(v).dtype.hasobject for v in values)):
+        return func(*values)
+
+    def chunk_args(chunk):
+        # only the values spanning the first axis are sliced, the others
+        # broadcast, so the dtype resolution is the same as for one call
+        return [v[chunk] if np.ndim(v) == len(shape) and v.shape[0] > 1
+                else v for v in values]
+    # a one-element call gives the output dtype
+    dtype = ufunc(*chunk_args(slice(0, 1))).dtype
+    out = np.empty(shape, dtype=dtype)
+    bounds = np.linspace(0, shape[0], min(n_threads, shape[0]) + 1, dtype=int)
+    slices = [slice(start, stop) for start, stop in zip(bounds[:-1],
+                                                        bounds[1:])]
+
+    def compute_chunk(chunk):
+        ufunc(*chunk_args(chunk), out=out[chunk])
+    # the caller computes the first chunk while the others run
+    futures = [executor.submit(compute_chunk, chunk) for chunk in slices[1:]]
+    compute_chunk(slices[0])
+    for future in futures:
+        future.result()
+    return out
+
+
 class QuantityIterator(object):
     """General Quantity iterator (as opposed to flat iterator)"""
 
@@ -2,28 +2,150 @@ from __future__ import annotations
 from collections.abc import Iterable
 from typing import Union
 
+import ast
 import functools
-from typing import Callable, Literal
-
+import hashlib
+import operator
+import os
+import re
+from collections import namedtuple, OrderedDict
+from fractions import Fraction
 from functools import lru_cache
-from operator import attrgetter
+from typing import Callable, Literal
 
 import numpy as np
 from numpy import array as np_array  # faster to import once since used in a loop
 import sympy as sp
 
 from sympy.parsing.sympy_parser import parse_expr
+from tokenize import TokenError
 
 from .quantity import Quantity, Dimension, DimensionError, dimensionify, quantify, make_quantity
+from .dimension import SI_SYMBOL_LIST, DIMENSIONLESS
+
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+def _dependency_key(value):
+    """Hashable key of a tracked attribute value.
+
+    Arrays are not hashable and Quantity.__hash__ stringifies the values,
+    so arrays are keyed by their shape, dtype and a 128-bit blake2b digest
+    of their buffer, and quantities by the key of their value and their
+    dimension. Hashing reads the whole buffer, so each access to a
+    property depending on an array costs O(n) in its size, which is still
+    much cheaper than most computations worth caching.
+    """
+    if isinstance(value, Quantity):
+        return (_dependency_key(value.value),
+                _dimension_key(value.dimension.dim_dict))
+    if isinstance(value, np.ndarray):
+        if value.dtype.hasobject:
+            return (value.shape, tuple(_dependency_key(x)
+                                       for x in value.flat))
+        value = np.ascontiguousarray(value)
+        return (value.shape, value.dtype.str,
+                hashlib.blake2b(value.view(np.uint8).data,
+                                digest_size=16).digest())
+    if isinstance(value, (list, tuple)):
+        return tuple(_dependency_key(x) for x in value)
+    return value
+
+
+class _DependentCache(object):
+    __slots__ = ("entries", "hits", "misses")
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+
+class _DependentCachedProperty(object):
+    """Read-only property cached on the values of other attributes.
+
+    Each instance holds its own cache, in its __dict__, so cached values
+    are released with the instance.
+    """
+
+    def __init__(self, func: Callable, attributes: tuple, maxsize):
+        self.func = func
+        self.attributes = attributes
+        self.maxsize = maxsize
+        self.attrname = None
+        self.__doc__ = func.__doc__
+
+    def __set_name__(self, owner, name):
+        self.attrname = name
+
+    def _cache(self, instance) -> _DependentCache:
+        try:
+            instance_dict = instance.__dict__
+        except AttributeError:
+            raise TypeError(
+                f"No '__dict__' attribute on {type(instance).__name__!r} "
+                f"instance to cache {self.attrname!r} property.") from None
+        cache_name = f"_{self.attrname}_cache"
+        cache = instance_dict.get(cache_name)
+        if cache is None:
+            cache = instance_dict[cache_name] = _DependentCache()
+        return cache
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        cache = self._cache(instance)
+        key = tuple(_dependency_key(getattr(instance, attribute))
+                    for attribute in self.attributes)
+        entries = cache.entries
+        try:
+            value = entries[key]
+        except KeyError:
+            cache.misses += 1
+            value = self.func(instance)
+            entries[key] = value
+            if self.maxsize is not None and len(entries) > self.maxsize:
+                entries.popitem(last=False)
+        else:
+            cache.hits += 1
+            entries.move_to_end(key)
+        return value
 
+    def __set__(self, instance, value):
+        raise AttributeError(f"can't set attribute {self.attrname!r}")
 
-def cached_property_depends_on(*args: tuple[str, ...]) -> Callable:
+    def cache_info(self, instance) -> CacheInfo:
+        """Hits, misses, maxsize and current size of an instance cache."""
+        cache = self._cache(instance)
+        return CacheInfo(cache.hits, cache.misses, self.maxsize,
+                         len(cache.entries))
+
+    def cache_clear(self, instance) -> None:
+        """Clear the cache and statistics of an instance."""
+        instance.__dict__.pop(f"_{self.attrname}_cache", None)
+
+
+def cached_property_depends_on(*args: tuple[str, ...],
+                               maxsize: int | None = 128) -> Callable:
     """
     Decorator to cache a property that depends on other attributes.
     This differs from functools.cached_property in that functools.cached_property is made for immutable atributes.
 
     Use on computation-heavy attributes.
 
+    Each instance holds its own cache of at most maxsize values (None for
+    no limit), keyed by the values of the tracked attributes, the least
+    recently used value being dropped first. The cache lives in the
+    instance __dict__, so it is released with the instance. Array and
+    Quantity attributes are tracked by their shape, dtype, dimension and a
+    digest of their values, so in-place modifications are seen, at the
+    cost of hashing the arrays at each access.
+
+    Hits and misses statistics of an instance are available with
+    type(instance).prop.cache_info(instance), and its cache is cleared with
+    type(instance).prop.cache_clear(instance).
+
     From https://stackoverflow.com/questions/48262273/python-bookkeeping-dependencies-in-cached-attributes-that-might-change
     For a version that handles arrays : https://gist.github.com/mocquin/e188c5c360fa6b53dd04427162d53f99
 
@@ -66,17 +188,15 @@ def cached_property_depends_on(*args: tuple[str, ...]) -> Callable:
     good = GOODTimeConstantRC(ohm, Farad)
     print("Good fisrt : ", good.tau) # This is long the first time...
     print("Good second : ", good.tau) # ... but not the second time since neither R nor C have changed.
+    print(GOODTimeConstantRC.tau.cache_info(good))
 
 
     """
-    attrs = attrgetter(*args)
+    if maxsize is not None and maxsize < 1:
+        raise ValueError(f"maxsize must be at least 1 or None, got {maxsize}.")
 
     def decorator(func):
-        _cache = lru_cache(maxsize=None)(lambda self, _: func(self))
-
-        def _with_tracked(self):
-            return _cache(self, attrs(self))
-        return property(_with_tracked, doc=func.__doc__)
+        return _DependentCachedProperty(func, args, maxsize)
     return decorator
 
 
@@ -171,10 +291,29 @@ def _parse_str_to_dic(exp_str: str) -> dict:
     --------
     parse_expr
     """
-    parsed = parse_expr(exp_str)
-    exp_dic = {str(key): value for key,
-               value in parsed.as_powers_dict().items()}
-    return exp_dic
+    return dict(_parse_str_to_powers(exp_str))
+
+
+@lru_cache(maxsize=1024)
+def _parse_str_to_powers(exp_str: str) -> tuple:
+    """Cached parsing of a power expression to (symbol, exponent) pairs.
+
+    The sympy exponents are converted to int, Fraction or float.
+    """
+    # names are always symbols, even names of sympy functions like "rad"
+    local_dict = {name: sp.Symbol(name)
+                  for name in re.findall(r"[A-Za-z_]\w*", exp_str)}
+    parsed = parse_expr(exp_str, local_dict=local_dict)
+    powers = []
+    for key, value in parsed.as_powers_dict().items():
+        if value.is_Integer:
+            value = int(value)
+        elif value.is_Rational:
+            value = Fraction(int(value.p), int(value.q))
+        else:
+            value = float(value)
+        powers.append((str(key), value))
+    return tuple(powers)
 
 
 def _exp_dic_to_q(exp_dic: dict, parsing_dict: dict) -> Union[Quantity, int]:
@@ -216,6 +355,112 @@ def strunit_array_to_qunit_array(array_like_of_str, parsing_dict: dict):
     return qs
 
 
+def _parse_unit_str(unit_str: str, parsing_dict: dict) -> Quantity:
+    """Parse a unit string, raising a ValueError naming it if it fails."""
+    try:
+        return quantify(expr_to_q(unit_str, parsing_dict))
+    except KeyError as e:
+        raise ValueError(f"Unknown unit {e.args[0]!r} in unit string "
+                         f"{unit_str!r}.") from None
+    except (SyntaxError, TokenError, TypeError, ValueError):
+        # invalid syntax, operators like "^", or non-numeric exponents
+        raise ValueError(f"Cannot parse unit string {unit_str!r}.") from None
+
+
+def _unique_strunits(array_like_of_str, parsing_dict: dict) -> tuple:
+    """Parse each distinct unit string once.
+
+    Returns the SI scale factors and the dimensions of the distinct units,
+    the indices of the distinct unit of each row, and the input shape.
+    Empty strings are dimensionless.
+    """
+    strs = np.asarray(array_like_of_str, dtype=str)
+    uniques, inverse = np.unique(strs.ravel(), return_inverse=True)
+    scales = np.empty(len(uniques))
+    dims = np.empty(len(uniques), dtype=object)
+    for i, unit_str in enumerate(uniques):
+        unit_str = str(unit_str).strip()
+        q = _parse_unit_str(unit_str, parsing_dict) if unit_str else 1
+        q = quantify(q)
+        scales[i] = q.value
+        dims[i] = q.dimension
+    return scales, dims, inverse.ravel(), strs.shape
+
+
+def strunit_array_to_scales(array_like_of_str, parsing_dict: dict) -> tuple:
+    """Parse an array of unit strings to SI scale factors and dimensions.
+
+    Columns of data usually contain a few distinct units : each distinct
+    string is parsed once, and the results are broadcast to all rows.
+
+    Parameters
+    ----------
+    array_like_of_str : array-like of str
+        Unit strings, like "mm" or "m/s**2".
+    parsing_dict : dict
+        Units to use for parsing, like physipy.units.
+
+    Returns
+    -------
+    scales : ndarray of float
+        SI-value of the unit of each row.
+    dimensions : ndarray of Dimension
+        Dimension of the unit of each row, with dtype object.
+
+    Examples
+    --------
+    >>> from physipy import units
+    >>> scales, dims = strunit_array_to_scales(["mm", "m", "mm"], units)
+    >>> scales
+    array([0.001, 1.   , 0.001])
+    >>> print(dims[0])
+    L
+    """
+    scales, dims, inverse, shape = _unique_strunits(array_like_of_str,
+                                                    parsing_dict)
+    return scales[inverse].reshape(shape), dims[inverse].reshape(shape)
+
+
+def values_strunits_to_quantity(values, array_like_of_str,
+                                parsing_dict: dict):
+    """Convert values expressed in units given as strings to SI.
+
+    Each distinct unit string is parsed once (see
+    strunit_array_to_scales).
+
+    Parameters
+    ----------
+    values : array-like
+        Magnitudes, broadcastable with array_like_of_str.
+    array_like_of_str : array-like of str
+        Unit string of each value.
+    parsing_dict : dict
+        Units to use for parsing, like physipy.units.
+
+    Returns
+    -------
+    Quantity or tuple
+        If all units have the same dimension, a Quantity with the values
+        converted to SI. Otherwise, a tuple with the values converted to
+        SI and the dimensions, as returned by strunit_array_to_scales.
+
+    Examples
+    --------
+    >>> from physipy import units
+    >>> print(values_strunits_to_quantity([1, 2, 3], ["mm", "m", "km"],
+    ...                                   units))
+    [1.e-03 2.e+00 3.e+03] m
+    """
+    scales, dims, inverse, shape = _unique_strunits(array_like_of_str,
+                                                    parsing_dict)
+    si_values = np.asarray(values) * scales[inverse].reshape(shape)
+    if len(dims) == 0:
+        return Quantity(si_values, DIMENSIONLESS)
+    if all(dim == dims[0] for dim in dims[1:]):
+        return Quantity(si_values, dims[0])
+    return si_values, dims[inverse].reshape(shape)
+
+
 def qarange(start_or_stop, stop=None, step=None, **kwargs) -> Quantity:
     """Wrapper around np.arange
 
@@ -266,17 +511,128 @@ def qarange(start_or_stop, stop=None, step=None, **kwargs) -> Quantity:
     return res
 
 
+GROUPBY_AGGREGATIONS = ("count", "sum", "mean", "min", "max", "var")
+
+
+def qgroupby(q, keys, aggs=GROUPBY_AGGREGATIONS) -> tuple:
+    """Aggregate the values of q grouped by keys.
+
+    All the requested aggregations are computed with vectorized numpy
+    operations : keys are factorized once with np.unique, then sums are
+    computed with np.bincount and extrema with ufunc.reduceat on the
+    group-sorted values.
+
+    Parameters
+    ----------
+    q : Quantity or array-like
+        Values to aggregate. Flattened if not 1-D.
+    keys : array-like
+        Group labels (integers, strings, ...), with the same size as q.
+    aggs : str or tuple of str, defaults to GROUPBY_AGGREGATIONS
+        Aggregations to compute, among "count", "sum", "mean", "min",
+        "max" and "var".
+
+    Returns
+    -------
+    labels : ndarray
+        The sorted unique keys.
+    dict
+        A dict with keys the aggregation names, and values the aggregated
+        values, in the order of labels. "count" is a plain integer array,
+        "var" has the dimension of q squared, others have the dimension
+        of q.
+
+    Examples
+    --------
+    >>> from physipy import m
+    >>> labels, res = qgroupby(np.array([1, 2, 3, 4])*m, [0, 1, 0, 1], "sum")
+    >>> labels
+    array([0, 1])
+    >>> res["sum"]
+    <Quantity : [4. 6.] m>
+    """
+    q = quantify(q)
+    aggs = _iterify(aggs)
+    unknown = set(aggs) - set(GROUPBY_AGGREGATIONS)
+    if unknown:
+        raise ValueError(f"Unknown aggregations {unknown}, expected values "
+                         f"among {GROUPBY_AGGREGATIONS}.")
+    values = np.ravel(q.value)
+    keys = np.ravel(keys)
+    if not keys.size == values.size:
+        raise ValueError(f"keys and values must have same size, got "
+                         f"{keys.size} and {values.size}.")
+
+    labels, inverse = np.unique(keys, return_inverse=True)
+    inverse = inverse.ravel()
+    n_groups = labels.size
+    counts = np.bincount(inverse, minlength=n_groups)
+
+    res = {}
+    if "count" in aggs:
+        res["count"] = counts
+    if any(agg in aggs for agg in ("sum", "mean", "var")):
+        sums = np.bincount(inverse, weights=values, minlength=n_groups)
+        if "sum" in aggs:
+            res["sum"] = Quantity(sums, q.dimension, favunit=q.favunit)
+        means = sums / counts
+        if "mean" in aggs:
+            res["mean"] = Quantity(means, q.dimension, favunit=q.favunit)
+        if "var" in aggs:
+            deviations = values - means[inverse]
+            var = np.bincount(inverse, weights=deviations * deviations,
+                              minlength=n_groups) / counts
+            var_favunit = (q.favunit**2 if isinstance(q.favunit, Quantity)
+                           else None)
+            res["var"] = Quantity(var, q.dimension**2, favunit=var_favunit)
+    if "min" in aggs or "max" in aggs:
+        # sort values by group, so each group is a contiguous slice
+        sorted_values = values[np.argsort(inverse, kind="stable")]
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        for agg, ufunc in (("min", np.minimum), ("max", np.maximum)):
+            if agg in aggs:
+                # reduceat fails on empty inputs
+                extrema = (ufunc.reduceat(sorted_values, starts)
+                           if n_groups > 0 else sorted_values[:0])
+                res[agg] = Quantity(extrema, q.dimension,
+                                    favunit=q.favunit)
+    return labels, res
+
+
 def _iterify(x):
     """make x iterable"""
     return [x] if not isinstance(x, (list, tuple)) else x
 
 
+# Set to False, or set the environment variable PHYSIPY_CHECK_DIMENSION to 0,
+# to make check_dimension return the undecorated functions. Must be set
+# before the decorated functions are defined.
+CHECK_DIMENSION = os.environ.get("PHYSIPY_CHECK_DIMENSION", "1") != "0"
+
+# Set the environment variable PHYSIPY_ERASE_UNITS to 1 before importing
+# physipy to run code without Quantity objects : the units and constants of
+# the physipy namespace are then plain floats, their SI-values, and the
+# decorators of this module work on such floats.
+ERASE_UNITS = os.environ.get("PHYSIPY_ERASE_UNITS", "0") == "1"
+
+
+def _scale_factor(unit):
+    """SI-value of a unit, as a float if scalar."""
+    value = quantify(unit).value
+    return float(value) if np.isscalar(value) else value
+
+
 def check_dimension(units_in=None, units_out=None) -> Callable:
     r"""Check dimensions of inputs and ouputs of function.
 
     Will check that all inputs and outputs have the same dimension
     than the passed units/quantities. Dimensions for inputs and
-    outputs expects a tuple.
+    outputs expects a tuple. The expected dimensions are computed once,
+    when decorating.
+
+    If CHECK_DIMENSION is False (see the PHYSIPY_CHECK_DIMENSION
+    environment variable), the function is returned undecorated, so
+    checked functions cost nothing once validated.
 
     Parameters
     ----------
@@ -326,40 +682,53 @@ def check_dimension(units_in=None, units_out=None) -> Callable:
     physipy.quantity.dimension.DimensionError: Dimension error : dimensions of operands are T and L, and are differents (time vs length).
     """
 
-    # reading args and making them iterable
+    # reading args, making them iterable, and resolving the expected
+    # dimensions once
+    dims_in = ()
+    dims_out = ()
     if units_in:
-        units_in = _iterify(units_in)
+        dims_in = tuple(dimensionify(unit) for unit in _iterify(units_in))
     if units_out:
-        units_out = _iterify(units_out)
+        dims_out = tuple(dimensionify(unit) for unit in _iterify(units_out))
 
     # define the decorator
     def decorator(func: Callable):
+        if not CHECK_DIMENSION or ERASE_UNITS:
+            return func
+        # last dimension objects that passed the check, for each input and
+        # output : most of the time, the same dimension objects are passed
+        # again, and identity is checked before equality
+        valid_in = list(dims_in)
+        valid_out = list(dims_out)
+
+        n_in = len(dims_in)
+        n_out = len(dims_out)
+
         # create a decorated func
         @functools.wraps(func)
         def decorated_func(*args, **kwargs):
             # Checking dimension of inputs
-            args = _iterify(args)
-            if units_in:
-                for arg, unit_in in zip(args, units_in):
-                    # make everything dimensions
-                    dim_check_in = dimensionify(unit_in)
-                    dim_arg = dimensionify(arg)
-                    # and checking dimensions
-                    if not dim_arg == dim_check_in:
-                        raise DimensionError(dim_arg, dim_check_in)
+            for i in range(min(len(args), n_in)):
+                arg = args[i]
+                dim_arg = (arg.dimension if isinstance(arg, Quantity)
+                           else dimensionify(arg))
+                if dim_arg is not valid_in[i]:
+                    if not dim_arg == dims_in[i]:
+                        raise DimensionError(dim_arg, dims_in[i])
+                    valid_in[i] = dim_arg
 
             # Compute outputs and iterify it
             ress = _iterify(func(*args, **kwargs))
 
             # Checking dimension of outputs
-            if units_out:
-                for res, unit_out in zip(ress, units_out):
-                    # make everythin dimensions
-                    dim_check_out = dimensionify(unit_out)
-                    dim_res = dimensionify(res)
-                    # and checking dimensions
-                    if not dim_res == dim_check_out:
-                        raise DimensionError(dim_res, dim_check_out)
+            for i in range(min(len(ress), n_out)):
+                res = ress[i]
+                dim_res = (res.dimension if isinstance(res, Quantity)
+                           else dimensionify(res))
+                if dim_res is not valid_out[i]:
+                    if not dim_res == dims_out[i]:
+                        raise DimensionError(dim_res, dims_out[i])
+                    valid_out[i] = dim_res
 
             # still return funcntion outputs
             return tuple(ress) if len(ress) > 1 else ress[0]
@@ -402,6 +771,9 @@ def set_favunit(*favunits_out) -> Callable:
     # make decorator
 
     def decorator(func):
+        if ERASE_UNITS:
+            return func
+
         # make decorated function
         @functools.wraps(func)
         def decorated_func(*args, **kwargs):
@@ -432,6 +804,8 @@ def dimension_and_favunit(inputs=[], outputs=[]) -> Callable:
     check_dimension : Decorator to check dimension of inputs and outputs.
     """
     def decorator(func):
+        if ERASE_UNITS:
+            return func
         return set_favunit(outputs)(check_dimension(inputs, outputs)(func))
     return decorator
 
@@ -451,18 +825,45 @@ def convert_to_unit(*unit_in, keep_dim=False) -> Callable:
     ...     return x_mm + y_mm + 1
     >>> print(add_one_mm(1*m, 2*m))
     3001.0
+
+    The scale factors and dimensions of the units are computed once, when
+    decorating, and the inputs must have the dimension of their unit.
     """
     unit_in = _iterify(unit_in)
+    scales = [_scale_factor(unit) for unit in unit_in]
+    dims_in = [dimensionify(unit) for unit in unit_in]
 
     def decorator(func):
+        if ERASE_UNITS:
+            @functools.wraps(func)
+            def erased(*args, **kwargs):
+                args = [arg / scale for arg, scale in zip(args, scales)]
+                return func(*args, **kwargs)
+            return erased
+
+        # last dimension objects that passed the check, see check_dimension
+        valid_in = list(dims_in)
+        n_in = len(dims_in)
+
         @functools.wraps(func)
         def decorated(*args, **kwargs):
             arg_unitless = []
-            for arg, unit in zip(args, unit_in):
+            for i in range(min(len(args), n_in)):
+                arg = args[i]
+                if isinstance(arg, Quantity):
+                    dim_arg = arg.dimension
+                    arg = arg.value
+                else:
+                    dim_arg = dimensionify(arg)
+                if dim_arg is not valid_in[i]:
+                    if not dim_arg == dims_in[i]:
+                        raise DimensionError(dim_arg, dims_in[i])
+                    valid_in[i] = dim_arg
                 if not keep_dim:
-                    arg_unitless.append(arg / unit)
+                    arg_unitless.append(arg / scales[i])
                 else:
-                    arg_unitless.append(Quantity(arg / unit, unit.dimension))
+                    arg_unitless.append(Quantity(arg / scales[i],
+                                                 dims_in[i]))
             return func(*arg_unitless, **kwargs)
         return decorated
     return decorator
@@ -485,6 +886,9 @@ def drop_dimension(func: Callable) -> Callable:
     >>> print(sum_length_from_floats(1.2*m, 2*m))
     3.2
     """
+    if ERASE_UNITS:
+        return func
+
     @functools.wraps(func)
     def dimension_dropped(*args, **kwargs):
         args = _iterify(args)
@@ -502,20 +906,94 @@ def add_back_unit_param(*unit_out: tuple[Quantity]) -> Callable:
         return x_m + y_m + 1, time_s
     print(timed_sum(1, 2))
 
+    The scale factors and dimensions of the units are computed once, when
+    decorating, so raw outputs are only multiplied by a number.
     """
     unit_out = _iterify(unit_out)
+    scales = [_scale_factor(unit) for unit in unit_out]
+    dims_out = [dimensionify(unit) for unit in unit_out]
+    dimless_out = [dim == Dimension(None) for dim in dims_out]
 
     def decorator(func):
+        if ERASE_UNITS:
+            @functools.wraps(func)
+            def erased(*args, **kwargs):
+                ress = _iterify(func(*args, **kwargs))
+                ress = [res * scale for res, scale in zip(ress, scales)]
+                return tuple(ress) if len(ress) > 1 else ress[0]
+            return erased
+
         @functools.wraps(func)
         def dimension_added_back_func(*args, **kwargs):
             ress = _iterify(func(*args, **kwargs))
             # multiply each output by the unit
-            ress_q = [res * unit for res, unit in zip(ress, unit_out)]
+            ress_q = []
+            for i in range(min(len(ress), len(unit_out))):
+                res = ress[i]
+                if isinstance(res, Quantity):
+                    ress_q.append(res * unit_out[i])
+                elif dimless_out[i]:
+                    ress_q.append(res * scales[i])
+                else:
+                    ress_q.append(Quantity(res * scales[i], dims_out[i]))
             return tuple(ress_q) if len(ress_q) > 1 else ress_q[0]
         return dimension_added_back_func
     return decorator
 
 
+_UNIT_EXPR_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Pow: operator.pow,
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+}
+
+# hashable signature of a dimension, to cache results per input dimensions
+_dimension_key = operator.itemgetter(*SI_SYMBOL_LIST)
+
+
+def _compile_unit_expr(expr: str) -> Callable:
+    """Compile a unit expression like "A*B/C**2" into a function.
+
+    The expression is parsed once into a tree of closures : the returned
+    function takes a dict binding the names of the expression to
+    quantities or dimensions, and evaluates the expression on them. Only
+    names, numbers and arithmetic operators are allowed.
+    """
+    def compile_node(node):
+        if isinstance(node, ast.Name):
+            name = node.id
+
+            def evaluate(bindings):
+                try:
+                    return bindings[name]
+                except KeyError:
+                    raise NameError(f"name '{name}' is not defined in unit "
+                                    f"expression {expr!r}.") from None
+            return evaluate
+        if (isinstance(node, ast.Constant)
+                and isinstance(node.value, (int, float))
+                and not isinstance(node.value, bool)):
+            value = node.value
+            return lambda bindings: value
+        if (isinstance(node, ast.BinOp)
+                and type(node.op) in _UNIT_EXPR_OPERATORS):
+            op = _UNIT_EXPR_OPERATORS[type(node.op)]
+            left = compile_node(node.left)
+            right = compile_node(node.right)
+            return lambda bindings: op(left(bindings), right(bindings))
+        if (isinstance(node, ast.UnaryOp)
+                and type(node.op) in _UNIT_EXPR_OPERATORS):
+            op = _UNIT_EXPR_OPERATORS[type(node.op)]
+            operand = compile_node(node.operand)
+            return lambda bindings: op(operand(bindings))
+        raise ValueError(f"Unsupported unit expression {expr!r}.")
+    return compile_node(ast.parse(str(expr).strip(), mode="eval").body)
+
+
 def decorate_with_various_unit(inputs=[], ouputs=[]) -> Callable:
     """
     allow abitrary specification of dimension and unit:
@@ -527,47 +1005,62 @@ def decorate_with_various_unit(inputs=[], ouputs=[]) -> Callable:
         - check that the inputs have coherent units vs each others
         - set the specified unit to the output
 
+    The output expressions are compiled once when decorating, and the
+    output units are cached for each combination of input dimensions, so
+    that calls with already seen dimensions only do a dict lookup.
+
     Examples
     --------
     @decorate_with_various_unit(('A', 'A'), 'A')
     def another_sum(x, y):
         return x + y
     print(another_sum(2*m, 1*m))
-
-    TODO : get rid of eval with a expression parser"""
+    """
     inputs_str = _iterify(inputs)
     outputs_str = _iterify(ouputs)
 
     def decorator(func):
+        if ERASE_UNITS:
+            return func
+
+        outputs_expr = [_compile_unit_expr(out_str) for out_str in outputs_str]
+        # output units, keyed by the dimensions of the inputs
+        outputs_units_cache = {}
+
+        def outputs_units(args_q, input_names):
+            dict_of_units = {}
+            for arg, input_name in zip(args_q, input_names):
+                si_unit = arg._SI_unitary_quantity
+                # check if input name (=unit or expression) already exists
+                if input_name in dict_of_units and (
+                        not si_unit == dict_of_units[input_name]):
+                    raise DimensionError(
+                        si_unit.dimension,
+                        (dict_of_units[input_name]).dimension)
+                # if input_name is new, add it's unit to dict
+                dict_of_units[input_name] = si_unit
+            # compute expression using decorator ouputs
+            return [expr(dict_of_units) for expr in outputs_expr]
+
         @functools.wraps(func)
         def decorated(*args, **kwargs):
-            dict_of_units = {}
-            list_inputs_value = []
+            args_q = []
+            input_names = []
             # loop over function's inputs and decorator's inputs
             for arg, input_name in zip(args, inputs_str):
-                if input_name == "pass":
-                    pass
-                #
-                else:
+                if input_name != "pass":
                     # turn input into quantity
-                    arg = quantify(arg)
-                    si_unit = arg._SI_unitary_quantity
-                    # store input value
-                    list_inputs_value.append(arg.value)
-                    # check if input name (=unit or expression) already exists
-                    if input_name in dict_of_units and (
-                            not si_unit == dict_of_units[input_name]):
-                        raise DimensionError(
-                            (arg._SI_unitary_quantity).dimension,
-                            (dict_of_units[input_name]).dimension)
-                    # if input_name is new, add it's unit to dict
-                    else:
-                        dict_of_units[input_name] = arg._SI_unitary_quantity
-            # compute expression using decorator ouputs
-            list_outputs_units = [eval(out_str, dict_of_units)
-                                  for out_str in outputs_str]
+                    args_q.append(quantify(arg))
+                    input_names.append(input_name)
+            key = tuple([_dimension_key(arg.dimension.dim_dict)
+                         for arg in args_q])
+            list_outputs_units = outputs_units_cache.get(key)
+            if list_outputs_units is None:
+                list_outputs_units = outputs_units(args_q, input_names)
+                outputs_units_cache[key] = list_outputs_units
             # compute function res on values
-            res_brute = _iterify(func(*list_inputs_value, **kwargs))
+            res_brute = _iterify(func(*[arg.value for arg in args_q],
+                                      **kwargs))
             # turn back raw outputs into quantities
             res_q = [res * unit for res,
                      unit in zip(res_brute, list_outputs_units)]
@@ -581,6 +1074,9 @@ def wrap_with_unit(dim_as_str):
     Idea to wrap a function regardless of absolut unit, but relative
     to input unit.
 
+    The expression is compiled once, and the output dimension is cached for
+    each input dimension.
+
     Examples
     --------
     # add one only to float/dimensionless
@@ -588,20 +1084,31 @@ def wrap_with_unit(dim_as_str):
         return x + 1
 
     # add one for any unit
-    dec_increment = generator("x")(increment)
+    dec_increment = wrap_with_unit("x")(increment)
 
     # increment(2*m) would fail but not
     dec_increment(2*m)
     """
     # define the decorator
     def decorator(func: Callable):
+        if ERASE_UNITS:
+            return func
+
+        dim_expr = _compile_unit_expr(dim_as_str)
+        dims_out_cache = {}
+
         # create a decorated func
         @functools.wraps(func)
         def decorated_func(x):
             x = quantify(x)
             dim_in = x.dimension
+            key = _dimension_key(dim_in.dim_dict)
+            dim_out = dims_out_cache.get(key)
+            if dim_out is None:
+                dim_out = dim_expr({"x": dim_in})
+                dims_out_cache[key] = dim_out
             res = func(x.value)
-            return Quantity(res, eval(dim_as_str, {"x": dim_in}))
+            return Quantity(res, dim_out)
         return decorated_func
     return decorator
 
@@ -651,60 +1158,62 @@ def name_eq(name) -> Callable:
     return wrapper
 
 
-def _flatten(x):
-    if isinstance(x, list):
-        return [a for i in x for a in _flatten(i)]
-    else:
-        return [x]
-
-
-def _is_nested(a):
-    return any(isinstance(i, list) for i in a)
+def _first_leaf(nested):
+    while isinstance(nested, list) and len(nested) > 0:
+        nested = nested[0]
+    return nested
 
 
-def _shape(lst):
-    def ishape(lst):
-        shapes = [ishape(x) if isinstance(x, list) else [] for x in lst]
-        shape = shapes[0]
-        if shapes.count(shape) != len(shapes):
-            raise ValueError('Ragged list')
-        shape.append(len(lst))
-        return shape
-    return tuple(reversed(ishape(lst)))
+def _quantities_values(items, dim: Dimension) -> list:
+    """Values of (nested lists of) quantities, that must have dimension dim.
 
-
-def _wrap(a):
-    if _is_nested(a):
-        shape = _shape(a)
-        flatten = list(_flatten(a))
-        return flatten, shape
-    else:
-        return a
+    The nested structure is kept, so that a single array can be built from
+    the returned list. Non-Quantity elements are dimensionless.
+    """
+    # last dimension object that passed the check : quantities often share
+    # the same dimension object, so identity is checked before equality
+    valid = dim
+    dim_dict = dim.dim_dict
+    dimensionless = dim == DIMENSIONLESS
+
+    def values(items):
+        nonlocal valid
+        res = []
+        append = res.append
+        for q in items:
+            if isinstance(q, Quantity):
+                q_dim = q.dimension
+                if q_dim is not valid:
+                    if q_dim.dim_dict != dim_dict:
+                        raise DimensionError(q_dim, dim)
+                    valid = q_dim
+                append(q.value)
+            elif isinstance(q, list):
+                append(values(q))
+            else:
+                if not dimensionless:
+                    raise DimensionError(DIMENSIONLESS, dim)
+                append(q)
+        return res
+    return values(items)
 
 
 def asqarray(array_like) -> Quantity:
-    """The value returned will always be a Quantity with array value"""
+    """The value returned will always be a Quantity with array value
+
+    The values of the quantities are collected in a single pass, and
+    converted once into an array, so converting a list of n quantities
+    takes a time linear in n.
+    """
 
     # tuple or list
     if isinstance(array_like, list) or isinstance(array_like, tuple):
         # here should test if any is quantity, not the first one
-        # also should test if list is flat or nested
-        if any(isinstance(i, Quantity) for i in array_like):
-            dim = quantify(array_like[0]).dimension
-            val_list = []
-            for q in array_like:
-                q = quantify(q)
-                if q.dimension == dim:
-                    val_list.append(q.value)
-                    res_val = np_array(val_list)
-                else:
-                    raise DimensionError(q.dimension, dim)
-            return Quantity(res_val, dim)
-        elif isinstance(array_like[0], list):
-            flat_array, shape = _wrap(array_like)
-            q = asqarray(flat_array)
-            q.value = q.value.reshape(shape)
-            return q
+        if (any(isinstance(i, Quantity) for i in array_like)
+                or isinstance(array_like[0], list)):
+            dim = quantify(_first_leaf(array_like[0])).dimension
+            return Quantity(np_array(_quantities_values(array_like, dim)),
+                            dim)
         # list/tuple of non-quantity value
         else:
             return quantify(array_like)
@@ -713,17 +1222,13 @@ def asqarray(array_like) -> Quantity:
         # non mono-element
         if array_like.size > 1:
             # check all value for dim consistency
-            if isinstance(array_like[0], Quantity):
-                dim = array_like[0].dimension
-                shape = array_like.shape
-                val_list = []
-                for q in array_like:
-                    if q.dimension == dim:
-                        val_list.append(q.value)
-                        res_val = np_array(val_list)
-                    else:
-                        raise DimensionError(q.dim, dim)
-                return Quantity(res_val.reshape(shape), dim)
+            if isinstance(array_like.flat[0], Quantity):
+                dim = array_like.flat[0].dimension
+                res_val = np_array(_quantities_values(list(array_like.flat),
+                                                      dim))
+                return Quantity(
+                    res_val.reshape(array_like.shape + res_val.shape[1:]),
+                    dim)
             else:
                 return quantify(array_like)
         # array is mono element